@@ -1,16 +1,32 @@
 import os
-import time
+import json
+import collections
 import base64
+import hashlib
+import secrets
 import tempfile
-import uuid
 import logging
+from urllib.parse import urlencode
+import sqlite3
 from typing import Optional, List, Dict, Any, Union
 from pathlib import Path
 import asyncio
+import contextlib
+import numpy as np
 import uvicorn
-from fastapi import FastAPI, HTTPException, BackgroundTasks, Request, Body
+from fastapi import (
+    FastAPI,
+    HTTPException,
+    BackgroundTasks,
+    Request,
+    Body,
+    Header,
+    Query,
+    WebSocket,
+)
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse, FileResponse
+from fastapi.responses import StreamingResponse, FileResponse, JSONResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 
@@ -26,8 +42,26 @@ from main import (
     OpenAITTS,
     OLLAMA_MODEL_NAME,
     OLLAMA_HOST,
+    OLLAMA_TEMPERATURE,
     RAG_KNOWLEDGE_FILE,
+    RAG_WATCH_INTERVAL,
     OUTPUT_DIR,
+    AUDIO_SAMPLE_RATE,
+    OPENAI_TTS_PCM_SAMPLE_RATE,
+    SentenceSplitter,
+    SpeechDetector,
+    StreamingTranscriber,
+)
+from cache import SQLiteCache
+from executor import PipelineExecutor, StageBusyError
+from rag_index import normalize_query
+from storage import AudioStore
+from audio_io import (
+    SNIFF_BYTES,
+    AudioDecodeError,
+    decode_audio,
+    decode_audio_stream,
+    sniff_audio_format,
 )
 
 # Create FastAPI app
@@ -42,17 +76,55 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Create directories for audio files if they don't exist
-TEMP_DIR = Path("temp_audio")
-TEMP_DIR.mkdir(exist_ok=True)
-
 # Create a custom output directory for API audio files
 API_AUDIO_DIR = Path("api_audio")
 API_AUDIO_DIR.mkdir(exist_ok=True)
 
+# Generated speech is evicted once unused for ORBIT_AUDIO_TTL seconds, or least
+# recently used first beyond ORBIT_AUDIO_MAX_MB; the janitor checks every
+# ORBIT_STORAGE_SWEEP_INTERVAL seconds
+AUDIO_MAX_BYTES = int(os.environ.get("ORBIT_AUDIO_MAX_MB", "1024")) * 1024 * 1024
+AUDIO_TTL = float(os.environ.get("ORBIT_AUDIO_TTL", str(7 * 86400)))
+STORAGE_SWEEP_INTERVAL = float(os.environ.get("ORBIT_STORAGE_SWEEP_INTERVAL", "300"))
+audio_store = AudioStore(API_AUDIO_DIR, AUDIO_MAX_BYTES, AUDIO_TTL)
+
+# /api/tts: formats it can stream, the longest text accepted (OpenAI's input limit),
+# and whether streamed audio is also saved to the store for the next request
+TTS_STREAM_MEDIA_TYPES = {
+    "mp3": "audio/mpeg",
+    "opus": "audio/ogg",
+    "aac": "audio/aac",
+    "flac": "audio/flac",
+    "wav": "audio/wav",
+    "pcm": f"audio/L16;rate={OPENAI_TTS_PCM_SAMPLE_RATE};channels=1",
+}
+TTS_MAX_TEXT_CHARS = 4096
+TTS_STREAM_CACHE = os.environ.get("ORBIT_TTS_STREAM_CACHE", "1") == "1"
+
+# Largest audio upload accepted by /api/audio/upload
+AUDIO_UPLOAD_MAX_BYTES = (
+    int(os.environ.get("ORBIT_AUDIO_UPLOAD_MAX_MB", "25")) * 1024 * 1024
+)
+
 # Mount the audio directory as a static files directory
 app.mount("/audio", StaticFiles(directory=str(API_AUDIO_DIR)), name="audio")
 
+# Voice sessions (/api/voice): silence that ends a user turn, and how many sessions
+# may run at once (each one runs its own streaming transcription thread)
+VOICE_END_SILENCE = float(os.environ.get("ORBIT_VOICE_END_SILENCE", "0.8"))
+VOICE_MAX_SESSIONS = int(os.environ.get("ORBIT_VOICE_MAX_SESSIONS", "8"))
+
+# Finished replies (text and audio file) by query, retrieved context and model
+# settings, so repeated questions skip the LLM and TTS; an empty path disables it
+RESPONSE_CACHE_PATH = os.environ.get(
+    "ORBIT_RESPONSE_CACHE_PATH", "response_cache.sqlite3"
+)
+RESPONSE_CACHE_SIZE = int(os.environ.get("ORBIT_RESPONSE_CACHE_SIZE", "1000"))
+RESPONSE_CACHE_TTL = float(os.environ.get("ORBIT_RESPONSE_CACHE_TTL", "86400"))
+
+# Required in the X-Admin-Token header of admin endpoints when set
+ADMIN_TOKEN = os.environ.get("ORBIT_ADMIN_TOKEN")
+
 # Initialize components
 stt_engine = WhisperSTT()
 llm_engine = OllamaLLM(model_name=OLLAMA_MODEL_NAME, host=OLLAMA_HOST)
@@ -65,7 +137,7 @@ class APIOpenAITTS(OpenAITTS):
         super().__init__(output_dir=str(API_AUDIO_DIR))
 
     def synthesize_speech(self, text_to_speak):
-        if not self.client:
+        if not self.backend:
             print(f"🔊 Agent (mock TTS): {text_to_speak}")
             return None
 
@@ -74,29 +146,20 @@ class APIOpenAITTS(OpenAITTS):
             return None
 
         try:
-            # Generate a unique filename for this speech
-            unique_filename = f"speech_{uuid.uuid4().hex}.mp3"
-            self.speech_file_path = Path(API_AUDIO_DIR) / unique_filename
+            # Files are named after their content, so text spoken before reuses its file
+            speech_file_path = speech_path(text_to_speak)
+            if audio_store.touch(speech_file_path):
+                return speech_file_path
 
             # Generate the speech file
-            with self.client.audio.speech.with_streaming_response.create(
-                model=self.model,
-                voice=self.voice,
-                input=text_to_speak,
-                response_format="mp3",
-            ) as response:
-                response.stream_to_file(self.speech_file_path)
-
-            if os.path.exists(self.speech_file_path):
-                return self.speech_file_path
-            else:
-                print(
-                    f"[TTS Engine] Speech file not found after synthesis: {self.speech_file_path}"
-                )
-                return None
+            self.write_atomic(
+                speech_file_path,
+                self.backend.synthesize(text_to_speak, self.file_format),
+            )
+            return speech_file_path
 
         except Exception as e:
-            print(f"[TTS Engine] Error during OpenAI TTS synthesis: {e}")
+            print(f"[TTS Engine] Error during TTS synthesis: {e}")
             import traceback
 
             traceback.print_exc()
@@ -106,10 +169,96 @@ class APIOpenAITTS(OpenAITTS):
 # Initialize our custom TTS engine
 tts_engine = APIOpenAITTS()
 
+response_cache = (
+    SQLiteCache(RESPONSE_CACHE_PATH, RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL)
+    if RESPONSE_CACHE_PATH
+    else None
+)
+
+# Blocking stages run in worker pools so one slow request cannot stall the event loop.
+# The llm and tts limits (streaming pumps included) must fit in ORBIT_IO_WORKERS.
+executor = (
+    PipelineExecutor()
+    # ffmpeg decodes run as subprocesses; the stage only bounds how many at once
+    .add_stage("decode", kind="cpu", max_concurrency=4, max_queue=16)
+    # Decodes on the shared Whisper model are serialized by its inference lock
+    .add_stage("stt", kind="cpu", max_concurrency=1, max_queue=8)
+    # RAG threads mostly wait on LocalRAG's query batcher, which does the CPU work,
+    # so many can run at once and their encodes share one model call. They get
+    # their own threads so a burst of queries cannot occupy the shared I/O pool.
+    .add_stage("rag", kind="dedicated", max_concurrency=32, max_queue=64)
+    .add_stage("llm", kind="io", max_concurrency=4, max_queue=16, retry_after=10)
+    .add_stage("tts", kind="io", max_concurrency=8, max_queue=32)
+)
+
+
+@app.exception_handler(StageBusyError)
+async def stage_busy_handler(request: Request, exc: StageBusyError):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": f"Server busy ({exc.stage}). Please retry shortly."},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+@app.on_event("startup")
+async def warmup_models():
+    # Run a dummy transcription so the first real request does not pay kernel init
+    await executor.run("stt", stt_engine.warmup)
+    # Start local TTS worker processes (and load their voice) before the first request
+    if tts_engine.backend:
+        await asyncio.to_thread(tts_engine.backend.warmup)
+
+
+@app.on_event("startup")
+async def watch_knowledge_base():
+    # Picks up edits to the knowledge files without a restart (RAG_WATCH_INTERVAL > 0)
+    rag_system.watch(RAG_WATCH_INTERVAL)
+
+
+async def storage_janitor():
+    stores = [audio_store]
+    if tts_engine.cache_store:
+        stores.append(tts_engine.cache_store)
+    while True:
+        for store in stores:
+            try:
+                stats = await asyncio.to_thread(store.sweep)
+            except OSError as e:
+                logger.error(f"Storage sweep of {store.root} failed: {e}")
+                continue
+            logger.debug(f"Swept {store.root}: {stats}")
+        await asyncio.sleep(STORAGE_SWEEP_INTERVAL)
+
+
+janitor_task = None
+
+
+@app.on_event("startup")
+async def start_storage_janitor():
+    global janitor_task
+    janitor_task = asyncio.create_task(storage_janitor())
+
+
+@app.on_event("shutdown")
+async def shutdown_executor():
+    if janitor_task:
+        janitor_task.cancel()
+    rag_system.stop_watching()
+    executor.shutdown(wait=False)
+    tts_engine.close()
+
 
 # Models for request/response
 class TextRequest(BaseModel):
     message: str
+    # Return an /api/tts URL that streams the speech, instead of synthesizing it first
+    stream_audio: bool = False
+
+
+class StreamTextRequest(TextRequest):
+    # Synthesize each sentence as soon as it is generated and stream the audio URLs
+    sentence_audio: bool = False
 
 
 class AudioRequest(BaseModel):
@@ -120,6 +269,18 @@ class AIResponse(BaseModel):
     text: str
     audio_url: Optional[str] = None
     resources: Optional[List[Dict[str, Any]]] = None
+    audio_segments: Optional[List[str]] = None
+
+
+def build_prompt(user_query, retrieved_context):
+    return f"""You are Orbit, a helpful, playful, and cheerful AI assistant.
+User Query: "{user_query}"
+Relevant Information from Knowledge Base:
+\"\"\"
+{retrieved_context}
+\"\"\"
+Based on the user query and relevant information, provide a concise, positive, and encouraging answer. If the information is insufficient, say so cheerfully and offer general help. Do not make up facts.
+Orbit (in a playful and cheering voice):"""
 
 
 # API endpoints
@@ -128,6 +289,40 @@ async def root():
     return {"message": "Orbit AI API is running"}
 
 
+@app.get("/api/stats")
+async def stats():
+    return {
+        "stages": executor.stats(),
+        "rag": rag_system.status(),
+        "rag_cache": rag_system.cache_stats(),
+        # A SQLite query that may wait on another worker's write lock
+        "response_cache": (
+            await asyncio.to_thread(response_cache.stats)
+            if response_cache is not None
+            else None
+        ),
+        "storage": {
+            "api_audio": audio_store.stats(),
+            "tts_cache": (
+                tts_engine.cache_store.stats() if tts_engine.cache_store else None
+            ),
+        },
+    }
+
+
+@app.post("/api/admin/reload-knowledge", status_code=202)
+async def reload_knowledge(x_admin_token: Optional[str] = Header(None)):
+    """Re-ingest the knowledge base in the background; queries keep using the old index."""
+    if not ADMIN_TOKEN:
+        raise HTTPException(
+            status_code=403, detail="Admin endpoints are disabled (ORBIT_ADMIN_TOKEN)"
+        )
+    if not secrets.compare_digest(x_admin_token or "", ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+    rag_system.reload()
+    return {"status": "reloading", "rag": rag_system.status()}
+
+
 @app.post("/api/text", response_model=AIResponse)
 async def process_text(request: TextRequest):
     """Process text input and return AI response"""
@@ -135,29 +330,13 @@ async def process_text(request: TextRequest):
         raise HTTPException(status_code=400, detail="Message cannot be empty")
 
     # Get context from RAG system
-    retrieved_context = rag_system.retrieve_context(request.message)
-
-    # Generate prompt
-    prompt = f"""You are Orbit, a helpful, playful, and cheerful AI assistant.
-User Query: "{request.message}"
-Relevant Information from Knowledge Base:
-\"\"\"
-{retrieved_context}
-\"\"\"
-Based on the user query and relevant information, provide a concise, positive, and encouraging answer. If the information is insufficient, say so cheerfully and offer general help. Do not make up facts.
-Orbit (in a playful and cheering voice):"""
-
-    # Generate response
-    llm_response = llm_engine.generate_response(prompt)
-
-    # Generate speech and get the file path
-    speech_file_path = tts_engine.synthesize_speech(llm_response)
+    retrieved_context = await executor.run(
+        "rag", rag_system.retrieve_context, request.message
+    )
 
-    # Get the URL to the audio file
-    audio_url = None
-    if speech_file_path:
-        # Use the /audio mount point we created
-        audio_url = f"/audio/{Path(speech_file_path).name}"
+    llm_response, audio_url = await answer(
+        request.message, retrieved_context, stream_audio=request.stream_audio
+    )
 
     # Return response
     return AIResponse(
@@ -169,183 +348,654 @@ Orbit (in a playful and cheering voice):"""
     )
 
 
-@app.post("/api/audio", response_model=AIResponse)
-async def process_audio(request: AudioRequest):
-    """Process audio input and return AI response"""
-    if not request.audio_data:
-        raise HTTPException(status_code=400, detail="Audio data cannot be empty")
+def audio_url_for(speech_file_path):
+    # Files in API_AUDIO_DIR are served from the /audio mount point
+    if not speech_file_path:
+        return None
+    return f"/audio/{audio_store.relative(speech_file_path)}"
+
 
+def response_cache_key(query, retrieved_context):
+    # Case, spacing and trailing punctuation don't change the question
+    settings = [
+        normalize_query(query),
+        hashlib.sha256(retrieved_context.encode("utf-8")).hexdigest(),
+        llm_engine.model_name,
+        OLLAMA_TEMPERATURE,
+        getattr(tts_engine, "model", None),
+        getattr(tts_engine, "voice", None),
+    ]
+    return hashlib.sha256(json.dumps(settings).encode("utf-8")).hexdigest()
+
+
+def cached_response(key):
+    """The cached (text, audio file path) for ``key``, if its audio still exists."""
     try:
-        # Decode base64 audio data
-        audio_bytes = base64.b64decode(
-            request.audio_data.split(",")[1]
-            if "," in request.audio_data
-            else request.audio_data
+        entry = response_cache.get(key)
+        # Touching the file also keeps the janitor from evicting audio still in use
+        if entry and not audio_store.touch(API_AUDIO_DIR / entry["audio_file"]):
+            response_cache.delete(key)
+            entry = None
+    except sqlite3.Error as e:
+        logger.warning(f"Response cache lookup failed: {e}")
+        return None
+    return entry
+
+
+def cache_response(key, text, speech_file_path):
+    try:
+        response_cache.set(
+            key, {"text": text, "audio_file": audio_store.relative(speech_file_path)}
         )
+    except sqlite3.Error as e:
+        logger.warning(f"Response cache write failed: {e}")
 
-        # Try to determine the audio format from the base64 data
-        audio_format = "webm"  # Default format
 
-        # Check for format indicators in the base64 data
-        if "data:audio/webm" in request.audio_data:
-            audio_format = "webm"
-        elif "data:audio/mp4" in request.audio_data:
-            audio_format = "mp4"
-        elif "data:audio/ogg" in request.audio_data:
-            audio_format = "ogg"
-        elif "data:audio/wav" in request.audio_data:
-            audio_format = "wav"
+def tts_stream_url(text):
+    """URL that streams ``text`` as speech, or ``None`` if /api/tts cannot serve it."""
+    if not tts_engine.backend or len(text) > TTS_MAX_TEXT_CHARS:
+        return None
+    return f"/api/tts?{urlencode({'text': text})}"
 
-        logger.info(f"Detected audio format: {audio_format}")
 
-        # Save to temporary file with appropriate extension
-        temp_file = TEMP_DIR / f"input_{int(time.time())}.{audio_format}"
-        with open(temp_file, "wb") as f:
-            f.write(audio_bytes)
+def speech_path(text, response_format=None):
+    # Where synthesized speech for ``text`` is (or will be) stored
+    response_format = response_format or tts_engine.file_format
+    return audio_store.path_for(
+        tts_engine.cache_key(text, response_format),
+        f".{response_format}",
+        prefix="speech_",
+    )
 
-        # Log the audio file details
-        logger.info(
-            f"Processing audio file: {temp_file} (size: {os.path.getsize(temp_file)} bytes)"
-        )
 
-        # Try multiple approaches to process the audio
-        transcribed_text = None
+async def answer(query, retrieved_context, stream_audio=False):
+    """Return the reply text and audio URL, from the response cache when possible.
+
+    With ``stream_audio`` no speech is synthesized here: the URL points to
+    /api/tts, which streams it once the client starts playback.
+    """
+    key = (
+        response_cache_key(query, retrieved_context)
+        if response_cache is not None
+        else None
+    )
+    if key:
+        entry = await asyncio.to_thread(cached_response, key)
+        if entry:
+            return entry["text"], audio_url_for(API_AUDIO_DIR / entry["audio_file"])
+
+    prompt = build_prompt(query, retrieved_context)
+    try:
+        llm_response = await executor.run("llm", llm_engine.generate, prompt)
+        cacheable = True
+    except StageBusyError:
+        raise
+    except Exception as e:
+        logger.error(f"LLM generation failed: {e}")
+        llm_response = f"Sorry, I encountered an error with the LLM: {e}"
+        cacheable = False  # Errors are answered but never replayed
+
+    # Replies too long for /api/tts are synthesized up front instead
+    audio_url = tts_stream_url(llm_response) if stream_audio else None
+    if audio_url:
+        # /api/tts saves the audio here as it streams; until then cache lookups miss
+        speech_file_path = speech_path(llm_response) if TTS_STREAM_CACHE else None
+    else:
+        speech_file_path = await executor.run(
+            "tts", tts_engine.synthesize_speech, llm_response
+        )
+        audio_url = audio_url_for(speech_file_path)
+    if key and cacheable and speech_file_path:
+        await asyncio.to_thread(cache_response, key, llm_response, speech_file_path)
+    return llm_response, audio_url
+
+
+@app.get("/api/tts")
+async def stream_tts(
+    text: str = Query(..., max_length=TTS_MAX_TEXT_CHARS),
+    response_format: Optional[str] = Query(None, alias="format"),
+):
+    """Stream synthesized speech, for use directly as an ``<audio>`` source.
+
+    Bytes from the TTS backend are forwarded as they arrive, so playback starts
+    on the first chunk; with ORBIT_TTS_STREAM_CACHE they are also saved to the
+    audio store, and later requests for the same text are served from disk.
+    ``format`` defaults to mp3, or wav for local voices.
+    """
+    if not tts_engine.backend:
+        raise HTTPException(status_code=503, detail="Text-to-speech is not available")
+    response_format = response_format or tts_engine.file_format
+    if response_format not in tts_engine.backend.formats:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported format; use one of {', '.join(tts_engine.backend.formats)}",
+        )
+    media_type = TTS_STREAM_MEDIA_TYPES[response_format]
+    if not text.strip():
+        raise HTTPException(status_code=400, detail="Text cannot be empty")
+
+    path = speech_path(text, response_format)
+    if audio_store.touch(path):
+        return FileResponse(path, media_type=media_type)
+
+    chunks = await executor.stream(
+        "tts",
+        tts_engine.stream_speech,
+        text,
+        response_format,
+        path if TTS_STREAM_CACHE else None,
+    )
+    # Wait for the first chunk so a failed synthesis is an error status, not a cut stream
+    try:
+        first = await chunks.__anext__()
+    except StopAsyncIteration:
+        first = b""
+    except Exception as e:
+        await chunks.aclose()
+        logger.error(f"TTS streaming failed: {e}")
+        raise HTTPException(status_code=502, detail="Speech synthesis failed")
 
-        # Approach 1: Try direct transcription with Whisper
+    async def body():
         try:
-            # Use whisper directly on the file
-            import whisper
-
-            logger.info("Attempting direct transcription with Whisper")
-            model = whisper.load_model("base")
-            result = model.transcribe(str(temp_file))
-            transcribed_text = result["text"].strip()
-            logger.info(
-                f"Direct Whisper transcription successful: '{transcribed_text}'"
-            )
-        except Exception as e:
-            logger.error(f"Error with direct Whisper transcription: {e}")
+            yield first
+            async for chunk in chunks:
+                yield chunk
+        finally:
+            await chunks.aclose()
 
-            # Approach 2: Try converting with ffmpeg and then using soundfile
-            try:
-                import subprocess
-                import soundfile as sf
-
-                logger.info("Converting audio with ffmpeg")
-                # Convert webm to wav using ffmpeg
-                wav_file = TEMP_DIR / f"converted_{int(time.time())}.wav"
-                subprocess.run(
-                    [
-                        "ffmpeg",
-                        "-i",
-                        str(temp_file),
-                        "-ar",
-                        "16000",
-                        "-ac",
-                        "1",
-                        "-f",
-                        "wav",
-                        str(wav_file),
-                    ],
-                    check=True,
-                    capture_output=True,
-                )
+    return StreamingResponse(body(), media_type=media_type)
 
-                logger.info(
-                    f"Conversion successful, reading with soundfile: {wav_file}"
-                )
 
-                # Try reading the converted file
-                audio_data, _ = sf.read(wav_file, dtype="float32")
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(jsonable_encoder(data))}\n\n"
 
-                # Transcribe audio data
-                transcribed_text = stt_engine.transcribe(audio_data)
-                logger.info(
-                    f"Transcription after conversion successful: '{transcribed_text}'"
-                )
 
-                # Clean up the converted file
-                os.remove(wav_file)
-            except Exception as conv_error:
-                logger.error(f"Error converting or processing audio: {conv_error}")
+@app.post("/api/text/stream")
+async def process_text_stream(request: StreamTextRequest):
+    """Stream the AI response as Server-Sent Events.
 
-                # Approach 3: Try a simpler conversion approach
-                try:
-                    logger.info("Trying simpler conversion approach")
-                    # Try a simpler ffmpeg command
-                    simple_wav_file = (
-                        TEMP_DIR / f"simple_converted_{int(time.time())}.wav"
-                    )
-                    subprocess.run(
-                        ["ffmpeg", "-y", "-i", str(temp_file), str(simple_wav_file)],
-                        check=True,
-                        capture_output=True,
-                    )
+    Emits one ``token`` event per generated token and a final ``done`` event
+    carrying the full ``AIResponse``. With ``sentence_audio`` set, each sentence
+    is sent to TTS while later ones are still generating, and ``audio`` events
+    (index, text, audio URL) are emitted in sentence order instead of a single
+    audio file at the end.
+    """
+    if not request.message:
+        raise HTTPException(status_code=400, detail="Message cannot be empty")
 
-                    # Try direct transcription on the converted file
-                    result = model.transcribe(str(simple_wav_file))
-                    transcribed_text = result["text"].strip()
-                    logger.info(
-                        f"Simple conversion transcription successful: '{transcribed_text}'"
-                    )
+    retrieved_context = await executor.run(
+        "rag", rag_system.retrieve_context, request.message
+    )
+    prompt = build_prompt(request.message, retrieved_context)
+
+    # Acquire the LLM slot before responding so an overloaded server still gets a 503
+    tokens = await executor.stream("llm", llm_engine.generate_stream, prompt)
+
+    async def events():
+        parts = []
+        splitter = SentenceSplitter()
+        pending = collections.deque()  # (sentence, synthesis task), in order
+        segments = []
+
+        def synthesize(sentence):
+            pending.append(
+                (
+                    sentence,
+                    asyncio.ensure_future(
+                        executor.run("tts", tts_engine.synthesize_speech, sentence)
+                    ),
+                )
+            )
 
-                    # Clean up
-                    os.remove(simple_wav_file)
-                except Exception as simple_error:
-                    logger.error(
-                        f"Error with simple conversion approach: {simple_error}"
-                    )
-                    return AIResponse(
-                        text="I had trouble processing your audio. Could you please try again with a clearer voice?",
-                        resources=[],
+        async def segment_event(sentence, task):
+            try:
+                audio_url = audio_url_for(await task)
+            except Exception as e:
+                logger.error(f"Sentence TTS failed: {e}")
+                audio_url = None
+            segments.append(audio_url)
+            return sse_event(
+                "audio",
+                {"index": len(segments) - 1, "text": sentence, "audio_url": audio_url},
+            )
+
+        try:
+            async for token in tokens:
+                parts.append(token)
+                yield sse_event("token", {"token": token})
+                if request.sentence_audio:
+                    for sentence in splitter.feed(token):
+                        synthesize(sentence)
+                    while pending and pending[0][1].done():
+                        yield await segment_event(*pending.popleft())
+            llm_response = "".join(parts)
+            audio_url = None
+            if request.sentence_audio:
+                for sentence in splitter.flush():
+                    synthesize(sentence)
+                while pending:
+                    yield await segment_event(*pending.popleft())
+            else:
+                audio_url = (
+                    tts_stream_url(llm_response) if request.stream_audio else None
+                )
+                if audio_url is None:
+                    audio_url = audio_url_for(
+                        await executor.run(
+                            "tts", tts_engine.synthesize_speech, llm_response
+                        )
                     )
 
-        if not transcribed_text:
-            return AIResponse(
-                text="I couldn't understand the audio. Could you please try again?",
-                resources=[],
+            yield sse_event(
+                "done",
+                AIResponse(
+                    text=llm_response,
+                    audio_url=audio_url,
+                    audio_segments=segments if request.sentence_audio else None,
+                    resources=[
+                        {
+                            "id": "1",
+                            "title": "Related Information",
+                            "content": retrieved_context,
+                        }
+                    ],
+                ),
             )
+        finally:
+            # Stops generation (and frees the LLM slot) when the client disconnects,
+            # and drops sentence audio that would never be sent
+            await tokens.aclose()
+            for _, task in pending:
+                task.cancel()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
-        # Process the transcribed text
-        retrieved_context = rag_system.retrieve_context(transcribed_text)
 
-        prompt = f"""You are Orbit, a helpful, playful, and cheerful AI assistant.
-User Query: "{transcribed_text}"
-Relevant Information from Knowledge Base:
-\"\"\"
-{retrieved_context}
-\"\"\"
-Based on the user query and relevant information, provide a concise, positive, and encouraging answer. If the information is insufficient, say so cheerfully and offer general help. Do not make up facts.
-Orbit (in a playful and cheering voice):"""
+async def decode_upload(decode, source, audio_format):
+    """Decode uploaded audio to 16 kHz float32; ``None`` if ffmpeg fails.
+
+    ``decode`` is ``decode_audio`` for bytes or ``decode_audio_stream`` for chunks.
+    """
+    try:
+        async with executor.slot("decode"):
+            return await decode(source, audio_format=audio_format)
+    except AudioDecodeError as e:
+        logger.error(f"Error decoding audio: {e}")
+        return None
 
-        llm_response = llm_engine.generate_response(prompt)
 
-        # Generate speech and get the file path
-        speech_file_path = tts_engine.synthesize_speech(llm_response)
+async def respond_to_audio(audio):
+    """Transcribe decoded audio and answer it like a text message."""
+    if audio is None:
+        return AIResponse(
+            text="I had trouble processing your audio. Could you please try again with a clearer voice?",
+            resources=[],
+        )
 
-        # Get the URL to the audio file
-        audio_url = None
-        if speech_file_path:
-            # Use the /audio mount point we created
-            audio_url = f"/audio/{Path(speech_file_path).name}"
+    # Transcription is CPU-bound, so it runs on the STT worker pool
+    transcribed_text = await executor.run("stt", stt_engine.transcribe, audio)
 
+    if not transcribed_text:
         return AIResponse(
-            text=llm_response,
-            audio_url=audio_url,
-            resources=[
-                {"id": "1", "title": "I heard you say", "content": transcribed_text},
-                {
-                    "id": "2",
-                    "title": "Related Information",
-                    "content": retrieved_context,
-                },
-            ],
+            text="I couldn't understand the audio. Could you please try again?",
+            resources=[],
         )
 
+    # Process the transcribed text
+    retrieved_context = await executor.run(
+        "rag", rag_system.retrieve_context, transcribed_text
+    )
+
+    llm_response, audio_url = await answer(transcribed_text, retrieved_context)
+
+    return AIResponse(
+        text=llm_response,
+        audio_url=audio_url,
+        resources=[
+            {"id": "1", "title": "I heard you say", "content": transcribed_text},
+            {
+                "id": "2",
+                "title": "Related Information",
+                "content": retrieved_context,
+            },
+        ],
+    )
+
+
+@app.post("/api/audio", response_model=AIResponse)
+async def process_audio(request: AudioRequest):
+    """Process audio input and return AI response"""
+    if not request.audio_data:
+        raise HTTPException(status_code=400, detail="Audio data cannot be empty")
+
+    try:
+        # Decode base64 audio data (optionally a "data:audio/...;base64," URL)
+        audio_bytes = base64.b64decode(
+            request.audio_data.split(",", 1)[1]
+            if "," in request.audio_data
+            else request.audio_data
+        )
+        audio_format = sniff_audio_format(audio_bytes[:SNIFF_BYTES])
+        logger.info(
+            f"Processing {audio_format or 'unknown'} audio ({len(audio_bytes)} bytes)"
+        )
+        audio = await decode_upload(decode_audio, audio_bytes, audio_format)
+        return await respond_to_audio(audio)
+
+    except StageBusyError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing audio: {str(e)}")
 
 
+async def iter_upload(upload, chunk_size=64 * 1024):
+    while chunk := await upload.read(chunk_size):
+        yield chunk
+
+
+def limit_request_body(request, max_bytes):
+    """Wrap ``request`` so reading more than ``max_bytes`` of body raises 413."""
+    received = 0
+
+    async def receive():
+        nonlocal received
+        message = await request.receive()
+        if message["type"] == "http.request":
+            received += len(message.get("body", b""))
+            if received > max_bytes:
+                raise HTTPException(status_code=413, detail="Audio upload too large")
+        return message
+
+    return Request(request.scope, receive)
+
+
+async def open_audio_stream(chunks):
+    """Validate the start of an uploaded audio stream before decoding it.
+
+    Returns ``(audio_format, chunks)``: the format sniffed from the first bytes,
+    and the full stream, which enforces AUDIO_UPLOAD_MAX_BYTES as it is read.
+    Raises 400 for an empty body, 413 when too large and 415 for an
+    unrecognised format.
+    """
+    iterator = chunks.__aiter__()
+    header = b""
+    while len(header) < SNIFF_BYTES:
+        try:
+            header += await iterator.__anext__()
+        except StopAsyncIteration:
+            break
+    if not header:
+        raise HTTPException(status_code=400, detail="Audio data cannot be empty")
+    audio_format = sniff_audio_format(header)
+    if audio_format is None:
+        raise HTTPException(status_code=415, detail="Unrecognised audio format")
+
+    async def stream():
+        size = len(header)
+        yield header
+        async for chunk in iterator:
+            size += len(chunk)
+            if size > AUDIO_UPLOAD_MAX_BYTES:
+                raise HTTPException(status_code=413, detail="Audio upload too large")
+            yield chunk
+
+    return audio_format, stream()
+
+
+@app.post("/api/audio/upload", response_model=AIResponse)
+async def process_audio_upload(request: Request):
+    """Process audio streamed as the raw request body or a multipart ``audio`` field.
+
+    Unlike ``/api/audio`` there is no base64 step: the body is piped into the
+    decoder as it arrives and the format is detected from its magic bytes.
+    """
+    content_length = request.headers.get("content-length")
+    if content_length:
+        try:
+            content_length = int(content_length)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid Content-Length header")
+        if content_length > AUDIO_UPLOAD_MAX_BYTES:
+            raise HTTPException(status_code=413, detail="Audio upload too large")
+    # Chunked bodies carry no length, and multipart forms are read whole
+    request = limit_request_body(request, AUDIO_UPLOAD_MAX_BYTES)
+
+    form = None
+    try:
+        if request.headers.get("content-type", "").startswith("multipart/form-data"):
+            form = await request.form()
+            upload = form.get("audio")
+            if upload is None or isinstance(upload, str):
+                raise HTTPException(
+                    status_code=400, detail="Expected an 'audio' file field"
+                )
+            chunks = iter_upload(upload)
+        else:
+            chunks = request.stream()
+
+        audio_format, chunks = await open_audio_stream(chunks)
+        logger.info(f"Receiving {audio_format} audio upload")
+        audio = await decode_upload(decode_audio_stream, chunks, audio_format)
+    finally:
+        if form is not None:
+            await form.close()
+
+    try:
+        return await respond_to_audio(audio)
+    except StageBusyError:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error processing audio: {str(e)}")
+
+
+class VoiceSession:
+    """One duplex voice conversation over a WebSocket.
+
+    The client streams microphone audio up as binary frames of 16 kHz mono
+    16-bit PCM. Speech is detected and transcribed as it arrives, and each turn
+    streams back ``token`` events plus one ``audio`` event per sentence, each
+    followed by a binary frame of 24 kHz 16-bit PCM. Speech that starts while a
+    reply is still in progress cancels it (barge-in).
+    """
+
+    def __init__(self, websocket):
+        self.websocket = websocket
+        self.detector = SpeechDetector(
+            sample_rate=AUDIO_SAMPLE_RATE, end_silence=VOICE_END_SILENCE
+        )
+        self.transcriber = None
+        self.turn = None  # Task producing the current reply
+        self._loop = asyncio.get_running_loop()
+        self._send_lock = asyncio.Lock()
+
+    async def send(self, event, data=None, audio=None):
+        # An audio event and its binary frame must not be split by another message
+        async with self._send_lock:
+            await self.websocket.send_text(
+                json.dumps(jsonable_encoder({"type": event, **(data or {})}))
+            )
+            if audio is not None:
+                await self.websocket.send_bytes(audio)
+
+    async def run(self):
+        await self.send(
+            "ready",
+            {
+                "sample_rate": AUDIO_SAMPLE_RATE,
+                "tts_sample_rate": OPENAI_TTS_PCM_SAMPLE_RATE,
+            },
+        )
+        try:
+            while True:
+                message = await self.websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+                if message.get("bytes") is not None:
+                    await self.on_audio(message["bytes"])
+                elif message.get("text"):
+                    await self.on_control(message["text"])
+        finally:
+            await self.interrupt(notify=False)
+            if self.transcriber:
+                await asyncio.to_thread(self.transcriber.cancel)
+
+    async def on_control(self, text):
+        try:
+            message = json.loads(text)
+        except ValueError:
+            message = None
+        if not isinstance(message, dict):
+            await self.send(
+                "error", {"detail": "Control messages must be JSON objects."}
+            )
+            return
+        if message.get("type") == "text" and message.get("message"):
+            await self.interrupt()
+            self.turn = asyncio.create_task(self.respond(message["message"]))
+        elif message.get("type") == "interrupt":
+            await self.interrupt()
+
+    async def on_audio(self, data):
+        pcm = np.frombuffer(data, dtype="<i2", count=len(data) // 2)
+        for event, audio in self.detector.process(pcm.astype(np.float32) / 32768.0):
+            if event == "start":
+                await self.interrupt()
+                self.transcriber = StreamingTranscriber(
+                    stt_engine, on_update=self.on_partial
+                )
+                await self.send("speech_start")
+            if audio is not None and self.transcriber:
+                self.transcriber.feed(audio)
+            if event == "end":
+                await self.end_of_speech()
+
+    def on_partial(self, text):
+        # Called from the transcriber's thread
+        self._loop.call_soon_threadsafe(
+            asyncio.ensure_future, self.send("partial", {"text": text})
+        )
+
+    async def end_of_speech(self):
+        transcriber, self.transcriber = self.transcriber, None
+        if transcriber is None:
+            return
+        try:
+            text = await executor.run("stt", transcriber.finish)
+        except StageBusyError as e:
+            await asyncio.to_thread(transcriber.cancel)
+            await self.send_busy(e)
+            return
+        await self.send("transcript", {"text": text or ""})
+        if text:
+            self.turn = asyncio.create_task(self.respond(text))
+
+    async def interrupt(self, notify=True):
+        turn, self.turn = self.turn, None
+        if turn is None or turn.done():
+            return
+        turn.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await turn
+        if notify:
+            await self.send("interrupted")
+
+    async def send_busy(self, error):
+        await self.send(
+            "error",
+            {
+                "detail": f"Server busy ({error.stage}). Please retry shortly.",
+                "retry_after": error.retry_after,
+            },
+        )
+
+    async def respond(self, text):
+        """Stream the reply to one user turn: tokens, then sentence audio in order."""
+        pending = collections.deque()  # (sentence, synthesis task), in order
+        tokens = None
+        try:
+            retrieved_context = await executor.run(
+                "rag", rag_system.retrieve_context, text
+            )
+            tokens = await executor.stream(
+                "llm", llm_engine.generate_stream, build_prompt(text, retrieved_context)
+            )
+            parts, splitter, index = [], SentenceSplitter(), 0
+
+            def synthesize(sentence):
+                task = asyncio.ensure_future(
+                    executor.run("tts", tts_engine.synthesize_pcm_bytes, sentence)
+                )
+                pending.append((sentence, task))
+
+            async def send_audio():
+                nonlocal index
+                sentence, task = pending.popleft()
+                try:
+                    pcm = await task
+                except StageBusyError:
+                    pcm = None
+                await self.send(
+                    "audio",
+                    {
+                        "index": index,
+                        "text": sentence,
+                        "sample_rate": OPENAI_TTS_PCM_SAMPLE_RATE,
+                        "format": "s16le",
+                        "size": len(pcm) if pcm else 0,
+                    },
+                    audio=pcm or b"",
+                )
+                index += 1
+
+            async for token in tokens:
+                parts.append(token)
+                await self.send("token", {"token": token})
+                for sentence in splitter.feed(token):
+                    synthesize(sentence)
+                while pending and pending[0][1].done():
+                    await send_audio()
+            for sentence in splitter.flush():
+                synthesize(sentence)
+            while pending:
+                await send_audio()
+            await self.send("done", {"text": "".join(parts)})
+        except StageBusyError as e:
+            await self.send_busy(e)
+        except Exception as e:
+            logger.error(f"Voice session reply failed: {e}")
+            with contextlib.suppress(Exception):
+                await self.send("error", {"detail": str(e)})
+        finally:
+            # Stops LLM generation at the next token when the turn is interrupted
+            if tokens is not None:
+                await tokens.aclose()
+            for _, task in pending:
+                task.cancel()
+
+
+active_voice_sessions = 0
+
+
+@app.websocket("/api/voice")
+async def voice_session(websocket: WebSocket):
+    """Duplex voice conversation; see ``VoiceSession`` for the message protocol."""
+    global active_voice_sessions
+    await websocket.accept()
+    if active_voice_sessions >= VOICE_MAX_SESSIONS:
+        # 1013: Try Again Later
+        await websocket.close(code=1013, reason="Too many voice sessions")
+        return
+    active_voice_sessions += 1
+    try:
+        await VoiceSession(websocket).run()
+    finally:
+        active_voice_sessions -= 1
+
+
 # We don't need this endpoint anymore since we're using StaticFiles
 # to serve audio files from the /audio mount point
 
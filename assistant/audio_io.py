@@ -0,0 +1,144 @@
+import os
+import asyncio
+import tempfile
+
+import numpy as np
+
+DECODE_SAMPLE_RATE = 16000  # Whisper's input rate
+
+# Bytes needed to recognise every format below
+SNIFF_BYTES = 12
+
+# Containers ffmpeg cannot demux from a pipe: MP4/M4A files written without
+# "faststart" keep their index (the moov atom) at the end, which needs seeking
+SEEKABLE_FORMATS = ("mp4",)
+
+
+def sniff_audio_format(header):
+    """Guess an audio container from its first bytes; ``None`` if unrecognised.
+
+    Returns a file extension ffmpeg understands: webm, ogg, wav, mp4, flac,
+    mp3 or aac.
+    """
+    if header.startswith(b"\x1a\x45\xdf\xa3"):
+        return "webm"  # EBML header; Matroska is read the same way
+    if header.startswith(b"OggS"):
+        return "ogg"
+    if header.startswith(b"RIFF") and header[8:12] == b"WAVE":
+        return "wav"
+    if header[4:8] == b"ftyp":
+        return "mp4"
+    if header.startswith(b"fLaC"):
+        return "flac"
+    if header.startswith(b"ID3"):
+        return "mp3"
+    if len(header) >= 2 and header[0] == 0xFF:
+        if header[1] & 0xF6 == 0xF0:
+            return "aac"  # ADTS frame sync
+        if header[1] & 0xE0 == 0xE0:
+            return "mp3"  # MPEG audio frame sync
+    return None
+
+
+class AudioDecodeError(Exception):
+    """Raised when ffmpeg cannot decode the audio (or is not installed)."""
+
+
+def ffmpeg_decode_command(sample_rate=DECODE_SAMPLE_RATE, source="pipe:0"):
+    # Encoded audio in on stdin (or from ``source``), 16-bit mono PCM out on stdout
+    return [
+        "ffmpeg",
+        "-hide_banner",
+        "-loglevel",
+        "error",
+        "-i",
+        source,
+        "-f",
+        "s16le",
+        "-ac",
+        "1",
+        "-ar",
+        str(sample_rate),
+        "pipe:1",
+    ]
+
+
+async def decode_audio_stream(
+    chunks, sample_rate=DECODE_SAMPLE_RATE, audio_format=None
+):
+    """Decode an async stream of encoded audio into a mono float32 array.
+
+    Chunks are piped into ffmpeg as they arrive, so decoding overlaps the
+    upload. Exceptions raised by ``chunks`` (such as size limits) propagate
+    after ffmpeg has been stopped. Formats in ``SEEKABLE_FORMATS`` are spooled
+    to a temporary file first, since ffmpeg has to seek in them.
+    """
+    if audio_format in SEEKABLE_FORMATS:
+        return await _decode_spooled(chunks, sample_rate, audio_format)
+    return await _run_ffmpeg(ffmpeg_decode_command(sample_rate), chunks)
+
+
+async def _decode_spooled(chunks, sample_rate, audio_format):
+    fd, path = tempfile.mkstemp(suffix=f".{audio_format}")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            async for chunk in chunks:
+                f.write(chunk)
+        return await _run_ffmpeg(ffmpeg_decode_command(sample_rate, path))
+    finally:
+        os.remove(path)
+
+
+async def _run_ffmpeg(command, chunks=None):
+    """Run an ffmpeg decode, feeding ``chunks`` to its stdin if given."""
+    try:
+        process = await asyncio.create_subprocess_exec(
+            *command,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+    except FileNotFoundError as e:
+        raise AudioDecodeError("ffmpeg is not installed or not on PATH") from e
+
+    async def feed():
+        if chunks is None:
+            process.stdin.close()
+            return
+        try:
+            async for chunk in chunks:
+                process.stdin.write(chunk)
+                await process.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # ffmpeg stopped reading; its exit status says why
+        finally:
+            process.stdin.close()
+
+    feeder = asyncio.create_task(feed())
+    try:
+        pcm, errors = await asyncio.gather(process.stdout.read(), process.stderr.read())
+        await process.wait()
+        await feeder
+    finally:
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
+        feeder.cancel()
+
+    if process.returncode:
+        message = errors.decode("utf-8", errors="replace").strip()
+        raise AudioDecodeError(
+            message[-500:] or f"ffmpeg exited with {process.returncode}"
+        )
+    audio = np.frombuffer(pcm, dtype=np.int16, count=len(pcm) // 2).astype(np.float32)
+    audio /= 32768.0
+    return audio
+
+
+async def decode_audio(data, sample_rate=DECODE_SAMPLE_RATE, audio_format=None):
+    """Decode encoded audio bytes already in memory; see ``decode_audio_stream``."""
+
+    async def single():
+        yield data
+
+    return await decode_audio_stream(single(), sample_rate, audio_format)
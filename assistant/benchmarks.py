@@ -0,0 +1,431 @@
+"""Performance reports for the Orbit AI pipeline.
+
+Usage:
+    python benchmarks.py rag-index [--vectors 100000] [--dim 384] [--queries 500]
+    python benchmarks.py rag-index --from-cache rag_index
+    python benchmarks.py rag-storage [--vectors 100000] [--documents 100000]
+    python benchmarks.py rag-retrieval [--documents 20000] [--queries 200]
+    python benchmarks.py embed-batching [--clients 1 8 32] [--requests 50]
+    python benchmarks.py tts-local --voice voices/en_US-lessac-medium.onnx [--workers 1 2 4]
+"""
+
+import time
+import argparse
+import tempfile
+import threading
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+
+from ingest import Chunk, ChunkStore, ChunkStoreWriter
+from rag_index import (
+    VECTOR_STORAGE_TYPES,
+    BM25Index,
+    EmbeddingBatcher,
+    IndexStore,
+    build_index,
+    content_hash,
+    evaluate_index,
+    resolve_index_config,
+    set_search_params,
+)
+from tts_backends import PCM_SAMPLE_RATE, PiperBackend
+
+try:
+    import faiss
+except ImportError:
+    faiss = None
+
+try:
+    from sentence_transformers import SentenceTransformer
+except ImportError:
+    SentenceTransformer = None
+
+
+def synthetic_embeddings(num_vectors, dim, num_clusters=256, seed=0):
+    """Clustered vectors, closer to real sentence embeddings than uniform noise."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((num_clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, num_clusters, num_vectors)
+    noise = 0.35 * rng.standard_normal((num_vectors, dim)).astype(np.float32)
+    return centers[labels] + noise
+
+
+def sample_queries(embeddings, num_queries, seed=1):
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(len(embeddings), num_queries, replace=False)
+    noise = 0.1 * rng.standard_normal((num_queries, embeddings.shape[1]))
+    return (embeddings[picks] + noise).astype(np.float32)
+
+
+def index_size_mb(index):
+    return faiss.serialize_index(index).nbytes / (1024 * 1024)
+
+
+def load_embeddings(args):
+    """Embeddings persisted by LocalRAG (``--from-cache``) or synthetic ones."""
+    if args.from_cache:
+        store = IndexStore(args.from_cache)
+        version_dir = store.current_version()
+        manifest = store.load_manifest(version_dir)
+        if not manifest or not manifest["count"]:
+            print(f"No persisted embeddings found in {args.from_cache}")
+            return None
+        embeddings = np.array(
+            store.load_embeddings(version_dir, manifest["count"], manifest["dim"])
+        )
+    else:
+        embeddings = synthetic_embeddings(args.vectors, args.dim)
+    if args.metric == "ip":
+        faiss.normalize_L2(embeddings)
+    return embeddings
+
+
+def rag_index_report(args):
+    embeddings = load_embeddings(args)
+    if embeddings is None:
+        return
+    queries = sample_queries(embeddings, min(args.queries, len(embeddings)))
+    if args.metric == "ip":
+        faiss.normalize_L2(queries)
+    num_vectors, dim = embeddings.shape
+
+    sweeps = {
+        "flat": [{}],
+        "hnsw": [{"ef_search": ef} for ef in (16, 32, 64, 128, 256)],
+        "ivf_flat": [{"nprobe": n} for n in (1, 4, 16, 64)],
+        "ivf_pq": [{"nprobe": n} for n in (4, 16, 64)],
+    }
+
+    print(f"Corpus: {num_vectors} vectors x {dim} dims, {len(queries)} queries")
+    print(
+        f"{'index':<10} {'param':<14} {'recall@' + str(args.k):>10} "
+        f"{'ms/query':>10} {'build s':>9} {'size MB':>9}"
+    )
+    for index_type, params_list in sweeps.items():
+        config = resolve_index_config(num_vectors, dim, index_type, args.metric)
+        if config["type"] != index_type:
+            print(f"{index_type:<10} skipped (corpus too small to train)")
+            continue
+        start = time.perf_counter()
+        index = build_index(embeddings, config)
+        build_s = time.perf_counter() - start
+        size_mb = index_size_mb(index)
+        for params in params_list:
+            set_search_params(index, **params)
+            result = evaluate_index(index, embeddings, queries, args.k, args.metric)
+            label = ", ".join(f"{k}={v}" for k, v in params.items()) or "-"
+            print(
+                f"{index_type:<10} {label:<14} {result['recall']:>10.3f} "
+                f"{result['latency_ms']:>10.3f} {build_s:>9.1f} {size_mb:>9.1f}"
+            )
+
+
+def synthetic_documents(num_documents, words_per_document=60, seed=0):
+    rng = np.random.default_rng(seed)
+    vocabulary = [f"word{i}" for i in range(5000)]
+    for i in range(num_documents):
+        words = rng.choice(vocabulary, words_per_document)
+        yield f"Document {i}: " + " ".join(words) + "."
+
+
+def heap_mb(build):
+    """Python heap still allocated by ``build()``'s result, in MB."""
+    tracemalloc.start()
+    result = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current / (1024 * 1024)
+
+
+def files_mb(directory):
+    return sum(f.stat().st_size for f in Path(directory).iterdir()) / (1024 * 1024)
+
+
+def rag_storage_report(args):
+    embeddings = load_embeddings(args)
+    if embeddings is None:
+        return
+    queries = sample_queries(embeddings, min(args.queries, len(embeddings)))
+    if args.metric == "ip":
+        faiss.normalize_L2(queries)
+    num_vectors, dim = embeddings.shape
+
+    print(f"Vectors: {num_vectors} x {dim} dims, {len(queries)} queries")
+    print(
+        f"{'index':<6} {'storage':<8} {'recall@' + str(args.k):>10} "
+        f"{'ms/query':>10} {'size MB':>9} {'saved':>7}"
+    )
+    for index_type in ("flat", "hnsw"):
+        baseline_mb = None
+        for storage in VECTOR_STORAGE_TYPES:
+            config = resolve_index_config(
+                num_vectors, dim, index_type, args.metric, storage=storage
+            )
+            index = set_search_params(build_index(embeddings, config), ef_search=128)
+            result = evaluate_index(index, embeddings, queries, args.k, args.metric)
+            size_mb = index_size_mb(index)
+            baseline_mb = baseline_mb or size_mb
+            print(
+                f"{index_type:<6} {storage:<8} {result['recall']:>10.3f} "
+                f"{result['latency_ms']:>10.3f} {size_mb:>9.1f} "
+                f"{1 - size_mb / baseline_mb:>7.0%}"
+            )
+
+    with tempfile.TemporaryDirectory() as directory:
+        writer = ChunkStoreWriter(directory)
+        for i, text in enumerate(synthetic_documents(args.documents)):
+            writer.append(Chunk("corpus.txt", i, text, content_hash(text)))
+        writer.close()
+        mapped_mb = files_mb(directory)
+        documents, list_mb = heap_mb(lambda: list(synthetic_documents(args.documents)))
+        del documents
+        store, store_mb = heap_mb(lambda: ChunkStore(directory))
+        del store
+        # The lexical index is built once per version, then mapped by every worker
+        lexical, built_mb = heap_mb(lambda: BM25Index.build(ChunkStore(directory)))
+        lexical.save(directory)
+        del lexical
+        postings_mb = files_mb(directory) - mapped_mb
+        lexical, lexical_mb = heap_mb(lambda: BM25Index.load(directory))
+        del lexical
+    print(f"\nDocuments: {args.documents} texts")
+    print(f"{'store':<14} {'heap MB':>9} {'mapped MB':>10}")
+    print(f"{'list[str]':<14} {list_mb:>9.1f} {0:>10.1f}")
+    print(f"{'ChunkStore':<14} {store_mb:>9.1f} {mapped_mb:>10.1f}")
+    print(f"{'BM25 (build)':<14} {built_mb:>9.1f} {0:>10.1f}")
+    print(f"{'BM25 (mapped)':<14} {lexical_mb:>9.1f} {postings_mb:>10.1f}")
+
+
+def synthetic_queries(documents, num_queries, seed=2):
+    """Three words from a random document, after a word that every document has."""
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(len(documents), num_queries, replace=False)
+    return [
+        "document " + " ".join(rng.choice(documents[i].split()[2:], 3)) for i in picks
+    ]
+
+
+def rag_retrieval_report(args):
+    if SentenceTransformer is None or faiss is None:
+        print("sentence-transformers and faiss are required for dense retrieval")
+        return
+    from main import LocalRAG
+
+    documents = list(synthetic_documents(args.documents))
+    queries = synthetic_queries(documents, min(args.queries, len(documents)))
+    with tempfile.TemporaryDirectory() as directory:
+        knowledge_file = Path(directory) / "corpus.txt"
+        knowledge_file.write_text("\n\n".join(documents), encoding="utf-8")
+        rag = LocalRAG(
+            knowledge_file=str(knowledge_file),
+            embedding_model_name=args.model,
+            index_dir=Path(directory) / "index",
+        )
+        rag.retrieve("warm-up query")
+
+        print(
+            f"\nCorpus: {len(rag.state.documents)} chunks, {len(queries)} queries "
+            f"(cold caches), model {args.model}"
+        )
+        print(f"{'mode':<8} {'p50 ms':>8} {'p95 ms':>8} {'mean ms':>8} {'encoded':>8}")
+        for mode in ("dense", "lexical", "hybrid"):
+            rag.retrieval_mode = mode
+            encodes = rag.embedding_cache.misses
+            latencies = []
+            for query in queries:
+                rag.result_cache.clear()
+                rag.embedding_cache.clear()
+                start = time.perf_counter()
+                rag.retrieve(query, args.k)
+                latencies.append(time.perf_counter() - start)
+            latencies.sort()
+            encoded = (rag.embedding_cache.misses - encodes) / len(queries)
+            print(
+                f"{mode:<8} {latencies[len(latencies) // 2] * 1000:>8.2f} "
+                f"{latencies[int(len(latencies) * 0.95)] * 1000:>8.2f} "
+                f"{sum(latencies) / len(latencies) * 1000:>8.2f} {encoded:>8.0%}"
+            )
+
+
+def run_clients(encode, num_clients, requests_per_client):
+    """Fire ``num_clients`` threads of sequential encodes; return per-call latencies."""
+    latencies = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(num_clients)
+
+    def client(client_id):
+        barrier.wait()
+        for i in range(requests_per_client):
+            text = (
+                f"Client {client_id} question {i}: how should I plan my calculus study?"
+            )
+            start = time.perf_counter()
+            encode(text)
+            with lock:
+                latencies.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=client, args=(c,)) for c in range(num_clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start, sorted(latencies)
+
+
+def embed_batching_report(args):
+    if SentenceTransformer is None:
+        print("sentence-transformers is required: pip install sentence-transformers")
+        return
+    model = SentenceTransformer(args.model)
+
+    def encode(texts):
+        return model.encode(
+            texts,
+            batch_size=len(texts),
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+        )
+
+    encode(["warm-up"] * 8)
+    print(f"Model: {args.model}, {args.requests} sequential requests per client")
+    print(
+        f"{'clients':>7} {'mode':<8} {'queries/s':>10} {'p50 ms':>8} "
+        f"{'p95 ms':>8} {'batch':>6}"
+    )
+    for num_clients in args.clients:
+        for mode in ("direct", "batched"):
+            batcher = None
+            if mode == "batched":
+                batcher = EmbeddingBatcher(
+                    encode, args.max_batch_size, args.max_wait_ms
+                )
+                call = batcher.encode
+            else:
+                call = lambda text: encode([text])
+            elapsed, latencies = run_clients(call, num_clients, args.requests)
+            p50 = latencies[len(latencies) // 2] * 1000
+            p95 = latencies[int(len(latencies) * 0.95)] * 1000
+            batch = batcher.stats()["mean_batch_size"] if batcher else 1.0
+            print(
+                f"{num_clients:>7} {mode:<8} {len(latencies) / elapsed:>10.1f} "
+                f"{p50:>8.1f} {p95:>8.1f} {batch:>6.1f}"
+            )
+
+
+TTS_SENTENCES = [
+    "Hello there! I'm Orbit, your friendly local assistant.",
+    "Ollama runs large language models on your own machine.",
+    "Retrieval finds the most relevant notes before the model answers.",
+    "Short sentences keep the first audio fast.",
+    "Let's try that again, or you can say quit to exit.",
+    "Whisper turns your voice into text for the rest of the pipeline.",
+    "Every answer is spoken sentence by sentence as it is generated.",
+    "Have a fantastic day!",
+]
+
+
+def tts_local_report(args):
+    sentences = TTS_SENTENCES * args.rounds
+    print(f"Voice: {args.voice}, {len(sentences)} sentences per batch")
+    print(
+        f"{'workers':>7} {'p50 ms':>8} {'p95 ms':>8} {'sentences/s':>12} "
+        f"{'x realtime':>11}"
+    )
+    for workers in args.workers:
+        try:
+            backend = PiperBackend(args.voice, workers=workers)
+        except (ImportError, FileNotFoundError) as e:
+            print(e)
+            return
+        backend.warmup()
+        latencies = []
+        for sentence in TTS_SENTENCES:
+            start = time.perf_counter()
+            backend.synthesize_pcm(sentence)
+            latencies.append(time.perf_counter() - start)
+        latencies.sort()
+
+        start = time.perf_counter()
+        pcm = backend.synthesize_many(sentences)
+        elapsed = time.perf_counter() - start
+        audio_seconds = sum(len(chunk) for chunk in pcm) / 2 / PCM_SAMPLE_RATE
+        backend.close()
+        print(
+            f"{workers:>7} {latencies[len(latencies) // 2] * 1000:>8.1f} "
+            f"{latencies[int(len(latencies) * 0.95)] * 1000:>8.1f} "
+            f"{len(sentences) / elapsed:>12.1f} {audio_seconds / elapsed:>11.1f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Orbit AI performance reports")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    rag_index = commands.add_parser(
+        "rag-index", help="Recall vs. latency of FAISS index types against flat search"
+    )
+    rag_index.add_argument("--vectors", type=int, default=100_000)
+    rag_index.add_argument("--dim", type=int, default=384)
+    rag_index.add_argument("--queries", type=int, default=500)
+    rag_index.add_argument("--k", type=int, default=10)
+    rag_index.add_argument("--metric", choices=("l2", "ip"), default="l2")
+    rag_index.add_argument(
+        "--from-cache",
+        metavar="INDEX_DIR",
+        help="Use embeddings persisted by LocalRAG instead of synthetic vectors",
+    )
+    rag_index.set_defaults(handler=rag_index_report)
+
+    rag_storage = commands.add_parser(
+        "rag-storage",
+        help="Memory and recall of float16/int8 vector storage against float32, "
+        "and memory of the chunk store and BM25 index",
+    )
+    rag_storage.add_argument("--vectors", type=int, default=100_000)
+    rag_storage.add_argument("--dim", type=int, default=384)
+    rag_storage.add_argument("--queries", type=int, default=500)
+    rag_storage.add_argument("--k", type=int, default=10)
+    rag_storage.add_argument("--metric", choices=("l2", "ip"), default="ip")
+    rag_storage.add_argument("--documents", type=int, default=100_000)
+    rag_storage.add_argument(
+        "--from-cache",
+        metavar="INDEX_DIR",
+        help="Use embeddings persisted by LocalRAG instead of synthetic vectors",
+    )
+    rag_storage.set_defaults(handler=rag_storage_report)
+
+    rag_retrieval = commands.add_parser(
+        "rag-retrieval",
+        help="Per-query latency of dense, lexical and hybrid LocalRAG retrieval",
+    )
+    rag_retrieval.add_argument("--model", default="all-MiniLM-L6-v2")
+    rag_retrieval.add_argument("--documents", type=int, default=20_000)
+    rag_retrieval.add_argument("--queries", type=int, default=200)
+    rag_retrieval.add_argument("--k", type=int, default=2)
+    rag_retrieval.set_defaults(handler=rag_retrieval_report)
+
+    embed_batching = commands.add_parser(
+        "embed-batching",
+        help="Query-encode throughput with and without micro-batching",
+    )
+    embed_batching.add_argument("--model", default="all-MiniLM-L6-v2")
+    embed_batching.add_argument("--clients", type=int, nargs="+", default=[1, 8, 32])
+    embed_batching.add_argument("--requests", type=int, default=50)
+    embed_batching.add_argument("--max-batch-size", type=int, default=32)
+    embed_batching.add_argument("--max-wait-ms", type=float, default=5)
+    embed_batching.set_defaults(handler=embed_batching_report)
+
+    tts_local = commands.add_parser(
+        "tts-local",
+        help="Latency and throughput of the offline Piper TTS backend by worker count",
+    )
+    tts_local.add_argument("--voice", required=True, help="Piper .onnx voice file")
+    tts_local.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    tts_local.add_argument("--rounds", type=int, default=4)
+    tts_local.set_defaults(handler=tts_local_report)
+
+    args = parser.parse_args()
+    args.handler(args)
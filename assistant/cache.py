@@ -0,0 +1,155 @@
+import json
+import os
+import sqlite3
+import time
+import threading
+from collections import OrderedDict
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire after ``ttl`` seconds.
+
+    ``ttl=None`` keeps entries until they are evicted by size. Hit and miss
+    counters are kept for monitoring.
+    """
+
+    def __init__(self, maxsize=1024, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and (entry[0] is None or entry[0] > time.monotonic()):
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+class SQLiteCache:
+    """``TTLCache`` counterpart persisted in a SQLite file.
+
+    Values must be JSON-serializable. Entries survive restarts and are shared
+    by every process using the same file (such as API workers); the least
+    recently used ones are deleted beyond ``maxsize``. Hit and miss counters
+    are per process.
+    """
+
+    def __init__(self, path, maxsize=1024, ttl=None):
+        self.path = str(path)
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._conn = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        # Opened lazily and reopened after a fork: connections must not cross processes
+        if self._conn is None or self._pid != os.getpid():
+            conn = sqlite3.connect(
+                self.path, timeout=5, isolation_level=None, check_same_thread=False
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, "
+                "value TEXT NOT NULL, expires_at REAL, accessed_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed_at)"
+            )
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    def __len__(self):
+        with self._lock:
+            return (
+                self._connection().execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+            )
+
+    def get(self, key, default=None):
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute(
+                "SELECT value, expires_at FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and (row[1] is None or row[1] > now):
+                conn.execute(
+                    "UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key)
+                )
+                self.hits += 1
+                return json.loads(row[0])
+            if row is not None:
+                conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        now = time.time()
+        expires_at = now + self.ttl if self.ttl else None
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), expires_at, now),
+            )
+            conn.execute("DELETE FROM cache WHERE expires_at <= ?", (now,))
+            conn.execute(
+                "DELETE FROM cache WHERE key IN (SELECT key FROM cache "
+                "ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.maxsize,),
+            )
+
+    def delete(self, key):
+        with self._lock:
+            self._connection().execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def clear(self):
+        with self._lock:
+            self._connection().execute("DELETE FROM cache")
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "size": len(self),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
@@ -0,0 +1,225 @@
+import os
+import asyncio
+import contextlib
+import functools
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger("orbit-executor")
+
+# --- Execution Configuration ---
+# I/O-bound stages (Ollama, OpenAI TTS) spend most of their time waiting on the network
+EXECUTOR_IO_WORKERS = int(os.environ.get("ORBIT_IO_WORKERS", "16"))
+# CPU-heavy stages (Whisper, SentenceTransformer) run in their own pool so they cannot
+# starve network-bound work. torch and faiss release the GIL inside their kernels.
+EXECUTOR_CPU_WORKERS = int(
+    os.environ.get("ORBIT_CPU_WORKERS", str(max(1, (os.cpu_count() or 2) // 2)))
+)
+DEFAULT_RETRY_AFTER_SECONDS = 5
+
+
+class StageBusyError(Exception):
+    """Raised when a pipeline stage has no free slot and its wait queue is full."""
+
+    def __init__(self, stage, retry_after=DEFAULT_RETRY_AFTER_SECONDS):
+        super().__init__(f"Pipeline stage '{stage}' is at capacity")
+        self.stage = stage
+        self.retry_after = retry_after
+
+
+class _StageGate:
+    def __init__(self, name, pool, max_concurrency, max_queue, retry_after):
+        self.name = name
+        self.pool = pool
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.retry_after = retry_after
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.active = 0
+        self.waiting = 0
+        self.completed = 0
+        self.rejected = 0
+
+
+class _StreamIterator:
+    """Async iterator over the items a ``PipelineExecutor.stream`` worker produces.
+
+    ``aclose``, or dropping the iterator, stops the worker even if iteration
+    never started, e.g. when the client disconnects before the response body.
+    """
+
+    def __init__(self, queue, stop):
+        self._queue = queue
+        self._stop = stop
+        self._done = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self._done:
+            raise StopAsyncIteration
+        done, item = await self._queue.get()
+        if not done:
+            return item
+        self._done = True
+        self._stop.set()
+        if item is not None:
+            raise item
+        raise StopAsyncIteration
+
+    async def aclose(self):
+        self._done = True
+        self._stop.set()
+
+    def __del__(self):
+        self._stop.set()
+
+
+class PipelineExecutor:
+    """Runs blocking pipeline stages off the event loop with per-stage limits.
+
+    Each stage gets a concurrency limit and a bounded wait queue. Once both are
+    full, ``run`` raises ``StageBusyError`` instead of queueing more work, which
+    the API turns into a 503 with a Retry-After header.
+
+    Stages share the "io" or "cpu" pool, whose size should cover the sum of
+    their limits: otherwise admitted jobs wait in the pool's own unbounded
+    queue while counted as active. A stage added with ``kind="dedicated"``
+    gets a pool of its own with one thread per slot.
+    """
+
+    def __init__(
+        self, io_workers=EXECUTOR_IO_WORKERS, cpu_workers=EXECUTOR_CPU_WORKERS
+    ):
+        self._pools = {
+            "io": ThreadPoolExecutor(
+                max_workers=io_workers, thread_name_prefix="orbit-io"
+            ),
+            "cpu": ThreadPoolExecutor(
+                max_workers=cpu_workers, thread_name_prefix="orbit-cpu"
+            ),
+        }
+        self._stages = {}
+
+    def add_stage(
+        self,
+        name,
+        kind="io",
+        max_concurrency=4,
+        max_queue=32,
+        retry_after=DEFAULT_RETRY_AFTER_SECONDS,
+    ):
+        if kind == "dedicated":
+            pool = ThreadPoolExecutor(
+                max_workers=max_concurrency, thread_name_prefix=f"orbit-{name}"
+            )
+            self._pools[name] = pool
+        elif kind in ("io", "cpu"):
+            pool = self._pools[kind]
+        else:
+            raise ValueError(
+                f"Unknown pool kind '{kind}'. Use 'io', 'cpu' or 'dedicated'."
+            )
+        self._stages[name] = _StageGate(
+            name, pool, max_concurrency, max_queue, retry_after
+        )
+        return self
+
+    async def run(self, stage, fn, *args, **kwargs):
+        """Run ``fn(*args, **kwargs)`` in the stage's pool and await the result."""
+        job = await self._submit(stage, functools.partial(fn, *args, **kwargs))
+        return await asyncio.wrap_future(job)
+
+    async def stream(self, stage, gen_fn, *args, **kwargs):
+        """Start a blocking generator in the stage's pool and return an async iterator.
+
+        The stage slot is acquired before this returns, so a full queue raises
+        ``StageBusyError`` here rather than midway through a streamed response.
+        Closing the returned iterator stops the worker at the next item.
+        """
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+        stop = threading.Event()
+
+        def pump():
+            error = None
+            gen = None
+            try:
+                gen = gen_fn(*args, **kwargs)
+                for item in gen:
+                    if stop.is_set():
+                        break
+                    loop.call_soon_threadsafe(queue.put_nowait, (False, item))
+            except Exception as e:
+                error = e
+            finally:
+                if hasattr(gen, "close"):
+                    gen.close()
+                loop.call_soon_threadsafe(queue.put_nowait, (True, error))
+
+        await self._submit(stage, pump)
+        return _StreamIterator(queue, stop)
+
+    @contextlib.asynccontextmanager
+    async def slot(self, stage):
+        """Hold one of the stage's slots around async work, e.g. a subprocess.
+
+        Same limits and ``StageBusyError`` as ``run``, without a pool thread.
+        """
+        gate = await self._acquire(stage)
+        try:
+            yield
+        finally:
+            self._release(gate)
+
+    async def _acquire(self, stage):
+        gate = self._stages[stage]
+        if gate.semaphore.locked() and gate.waiting >= gate.max_queue:
+            gate.rejected += 1
+            logger.warning(f"Stage '{stage}' queue full; rejecting request")
+            raise StageBusyError(stage, gate.retry_after)
+
+        gate.waiting += 1
+        try:
+            await gate.semaphore.acquire()
+        finally:
+            gate.waiting -= 1
+        gate.active += 1
+        return gate
+
+    async def _submit(self, stage, call):
+        gate = await self._acquire(stage)
+        loop = asyncio.get_running_loop()
+        try:
+            job = gate.pool.submit(call)
+        except BaseException:
+            self._release(gate)
+            raise
+        # Release the slot when the worker thread actually finishes, not when the
+        # awaiting request is cancelled, so limits reflect real pool occupancy.
+        job.add_done_callback(lambda _: loop.call_soon_threadsafe(self._release, gate))
+        return job
+
+    def _release(self, gate):
+        gate.active -= 1
+        gate.completed += 1
+        gate.semaphore.release()
+
+    def stats(self):
+        return {
+            name: {
+                "active": gate.active,
+                "waiting": gate.waiting,
+                "max_concurrency": gate.max_concurrency,
+                "max_queue": gate.max_queue,
+                "completed": gate.completed,
+                "rejected": gate.rejected,
+            }
+            for name, gate in self._stages.items()
+        }
+
+    def shutdown(self, wait=True):
+        for pool in self._pools.values():
+            pool.shutdown(wait=wait, cancel_futures=True)
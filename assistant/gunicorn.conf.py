@@ -0,0 +1,36 @@
+"""Gunicorn settings for running the API with several worker processes.
+
+Usage (from the assistant/ directory):
+    gunicorn -c gunicorn.conf.py api:app
+
+The app is imported once in the master process before workers are forked, so
+the Whisper and SentenceTransformer weights are loaded a single time and shared
+copy-on-write. The FAISS index and chunk store are memory-mapped files, which
+all workers share through the page cache.
+"""
+
+import gc
+import os
+
+bind = os.environ.get("ORBIT_BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("ORBIT_WORKERS", "4"))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+timeout = 120  # Transcription and LLM calls can take a while
+
+
+def when_ready(server):
+    # Move everything loaded so far out of the garbage collector's view, so
+    # collections in the workers don't write to (and un-share) those pages
+    gc.collect()
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    # Split the CPU between workers instead of each spawning one torch thread per core
+    try:
+        import torch
+
+        torch.set_num_threads(max(1, (os.cpu_count() or 1) // workers))
+    except ImportError:
+        pass
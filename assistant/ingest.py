@@ -0,0 +1,309 @@
+"""Streaming ingestion pipeline for the local RAG knowledge base.
+
+Source files are read line by line, split into chunks that respect paragraph
+boundaries and a token budget, and written to a compact on-disk ChunkStore.
+Embeddings are computed in fixed-size windows and appended to disk, so neither
+the full text nor the full embedding matrix has to fit in memory.
+
+Usage:
+    python ingest.py knowledge_base.txt notes/ more_notes.md
+"""
+
+import os
+import mmap
+import json
+import argparse
+from pathlib import Path
+from collections import namedtuple
+
+import numpy as np
+
+from rag_index import content_hash
+from sentences import iter_sentences
+
+INGEST_EXTENSIONS = (".txt", ".md")
+INGEST_WINDOW_SIZE = 1024  # Chunks embedded and written per step
+
+Chunk = namedtuple("Chunk", ["source", "offset", "text", "hash"])
+_Unit = namedtuple("_Unit", ["offset", "text", "tokens"])
+
+
+def count_tokens(text):
+    # Whitespace words; close enough to model tokens for budgeting chunk sizes
+    return len(text.split())
+
+
+def iter_source_files(sources, extensions=INGEST_EXTENSIONS):
+    """Yield files from a mix of file and directory paths, directories recursively."""
+    for source in sources:
+        path = Path(source)
+        if path.is_dir():
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    if Path(name).suffix.lower() in extensions:
+                        yield Path(root) / name
+        elif path.is_file():
+            yield path
+
+
+def source_fingerprint(sources, extensions=INGEST_EXTENSIONS):
+    """Cheap change detector for a set of sources: path, size and mtime of each file."""
+    fingerprint = []
+    for path in iter_source_files(sources, extensions):
+        stat = path.stat()
+        fingerprint.append([str(path), stat.st_size, stat.st_mtime_ns])
+    return fingerprint
+
+
+def _iter_units(path, max_tokens):
+    """Yield text units of at most ``max_tokens`` with their byte offsets.
+
+    ``None`` is yielded at paragraph (blank line) boundaries so chunks never
+    span two paragraphs.
+    """
+    offset = 0
+    with open(path, "rb") as f:
+        for raw in f:
+            line = raw.decode("utf-8", errors="replace").strip()
+            if not line:
+                yield None
+            elif count_tokens(line) <= max_tokens:
+                yield _Unit(offset, line, count_tokens(line))
+            else:
+                # Long lines are split into sentences, and long sentences into words
+                for sentence in iter_sentences(line):
+                    words = sentence.split()
+                    for start in range(0, len(words), max_tokens):
+                        piece = words[start : start + max_tokens]
+                        yield _Unit(offset, " ".join(piece), len(piece))
+            offset += len(raw)
+    yield None
+
+
+def iter_chunks(path, max_tokens=128, overlap_tokens=24):
+    """Stream ``Chunk``s from one file.
+
+    Consecutive lines of a paragraph are packed up to ``max_tokens``. When a
+    paragraph is split, each chunk starts with up to ``overlap_tokens`` of the
+    previous chunk's trailing lines.
+    """
+    source = str(path)
+    current, size = [], 0
+
+    def emit(units):
+        text = "\n".join(unit.text for unit in units)
+        return Chunk(source, units[0].offset, text, content_hash(text))
+
+    for unit in _iter_units(path, max_tokens):
+        if unit is None:
+            if current:
+                yield emit(current)
+            current, size = [], 0
+            continue
+        if current and size + unit.tokens > max_tokens:
+            yield emit(current)
+            carry, carried = [], 0
+            for previous in reversed(current):
+                if carried + previous.tokens > overlap_tokens:
+                    break
+                carry.insert(0, previous)
+                carried += previous.tokens
+            while carry and carried + unit.tokens > max_tokens:
+                carried -= carry.pop(0).tokens
+            current, size = carry, carried
+        current.append(unit)
+        size += unit.tokens
+
+
+def iter_corpus_chunks(sources, max_tokens=128, overlap_tokens=24):
+    for path in iter_source_files(sources):
+        yield from iter_chunks(path, max_tokens, overlap_tokens)
+
+
+class ChunkStore:
+    """Read-only, memory-mapped chunk texts and metadata.
+
+    ``texts.bin`` holds UTF-8 chunk texts back to back, ``chunks.rec`` one
+    fixed-size record per chunk and ``sources.json`` the source paths. Texts are
+    decoded on access, so the store costs almost no Python heap per chunk.
+    """
+
+    TEXTS_FILE = "texts.bin"
+    RECORDS_FILE = "chunks.rec"
+    SOURCES_FILE = "sources.json"
+    RECORD_DTYPE = np.dtype(
+        [
+            ("text_start", "<i8"),
+            ("text_len", "<i4"),
+            ("source_id", "<i4"),
+            ("source_offset", "<i8"),
+            ("hash", "u1", (16,)),
+        ]
+    )
+
+    def __init__(self, directory):
+        directory = Path(directory)
+        with open(directory / self.SOURCES_FILE, "r", encoding="utf-8") as f:
+            self.sources = json.load(f)
+        records_path = directory / self.RECORDS_FILE
+        self.records = (
+            np.memmap(records_path, dtype=self.RECORD_DTYPE, mode="r")
+            if records_path.stat().st_size
+            else np.empty(0, dtype=self.RECORD_DTYPE)
+        )
+        self._texts = b""
+        texts_path = directory / self.TEXTS_FILE
+        if texts_path.stat().st_size:
+            with open(texts_path, "rb") as f:
+                self._texts = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, i):
+        if not -len(self) <= i < len(self):
+            raise IndexError(i)
+        record = self.records[i]
+        start = int(record["text_start"])
+        return self._texts[start : start + int(record["text_len"])].decode("utf-8")
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def hash(self, i):
+        return self.records[i]["hash"].tobytes().hex()
+
+    def sorted_hashes(self):
+        """``(hashes, rows)``: chunk hashes sorted for ``np.searchsorted`` lookups."""
+        keys = np.ascontiguousarray(self.records["hash"]).view("S16").ravel()
+        order = np.argsort(keys, kind="stable")
+        return keys[order], order
+
+    def metadata(self, i):
+        record = self.records[i]
+        return {
+            "source": self.sources[int(record["source_id"])],
+            "offset": int(record["source_offset"]),
+            "hash": self.hash(i),
+        }
+
+
+class ChunkStoreWriter:
+    """Appends chunks to a ChunkStore directory as they stream in."""
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._texts = open(self.directory / ChunkStore.TEXTS_FILE, "wb")
+        self._records = open(self.directory / ChunkStore.RECORDS_FILE, "wb")
+        self._source_ids = {}
+        self._text_pos = 0
+        self.count = 0
+
+    def append(self, chunk):
+        encoded = chunk.text.encode("utf-8")
+        source_id = self._source_ids.setdefault(chunk.source, len(self._source_ids))
+        record = np.zeros(1, dtype=ChunkStore.RECORD_DTYPE)
+        record["text_start"] = self._text_pos
+        record["text_len"] = len(encoded)
+        record["source_id"] = source_id
+        record["source_offset"] = chunk.offset
+        record["hash"][0] = np.frombuffer(bytes.fromhex(chunk.hash), dtype=np.uint8)
+        self._texts.write(encoded)
+        self._records.write(record.tobytes())
+        self._text_pos += len(encoded)
+        self.count += 1
+
+    def close(self):
+        self._texts.close()
+        self._records.close()
+        with open(self.directory / ChunkStore.SOURCES_FILE, "w", encoding="utf-8") as f:
+            json.dump(list(self._source_ids), f)
+
+
+def ingest(
+    sources,
+    directory,
+    encode_fn,
+    cached_chunks=None,
+    cached_embeddings=None,
+    max_tokens=128,
+    overlap_tokens=24,
+    window_size=INGEST_WINDOW_SIZE,
+    embeddings_file="embeddings.f32",
+):
+    """Chunk ``sources`` into ``directory`` and append their embeddings to disk.
+
+    Chunks whose hash appears in ``cached_chunks`` reuse the matching row of
+    ``cached_embeddings``; only new or changed chunks go through ``encode_fn``.
+    Returns ``{"chunks", "embedded", "reused", "dim"}``.
+    """
+    directory = Path(directory)
+    writer = ChunkStoreWriter(directory)
+    cached_keys, cached_rows = (
+        cached_chunks.sorted_hashes()
+        if cached_chunks is not None and len(cached_chunks)
+        else (None, None)
+    )
+    stats = {"chunks": 0, "embedded": 0, "reused": 0, "dim": None}
+
+    with open(directory / embeddings_file, "wb") as out:
+
+        def flush(window):
+            keys = np.array(
+                [bytes.fromhex(chunk.hash) for chunk in window], dtype="S16"
+            )
+            rows = np.full(len(window), -1)
+            if cached_keys is not None:
+                pos = np.searchsorted(cached_keys, keys).clip(0, len(cached_keys) - 1)
+                found = cached_keys[pos] == keys
+                rows[found] = cached_rows[pos[found]]
+            missing = np.flatnonzero(rows < 0)
+            new_embeddings = (
+                encode_fn([window[i].text for i in missing]) if len(missing) else None
+            )
+            dim = (
+                new_embeddings.shape[1]
+                if new_embeddings is not None
+                else cached_embeddings.shape[1]
+            )
+            block = np.empty((len(window), dim), dtype=np.float32)
+            if new_embeddings is not None:
+                block[missing] = new_embeddings
+            reused = np.flatnonzero(rows >= 0)
+            if len(reused):
+                # Read cached rows in file order so the memory map is scanned forwards
+                order = np.argsort(rows[reused])
+                block[reused[order]] = cached_embeddings[rows[reused][order]]
+            out.write(block.tobytes())
+            stats["dim"] = dim
+            stats["embedded"] += len(missing)
+            stats["reused"] += len(reused)
+
+        window = []
+        for chunk in iter_corpus_chunks(sources, max_tokens, overlap_tokens):
+            writer.append(chunk)
+            window.append(chunk)
+            stats["chunks"] += 1
+            if len(window) >= window_size:
+                flush(window)
+                window = []
+        if window:
+            flush(window)
+
+    writer.close()
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Chunk, embed and index knowledge sources for Orbit AI's local RAG"
+    )
+    parser.add_argument("sources", nargs="+", help="Files or directories to ingest")
+    args = parser.parse_args()
+
+    from main import LocalRAG
+
+    LocalRAG(knowledge_file=args.sources)
@@ -16,6 +16,13 @@ import numpy as np
 import torch  # Retained for Whisper STT and FAISS if GPU is used
 import argparse
 import collections
+import hashlib
+import itertools
+import json
+import queue
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 # Attempt to import necessary libraries
 try:
@@ -64,11 +71,31 @@ except ImportError:
     )
     faiss = None
 
+from cache import TTLCache
+from ingest import ChunkStore, ingest, iter_corpus_chunks, source_fingerprint
+from rag_index import (
+    BM25Index,
+    EmbeddingBatcher,
+    IndexStore,
+    build_index,
+    normalize_query,
+    resolve_index_config,
+    set_search_params,
+)
+from sentences import SENTENCE_BOUNDARY_RE
+from storage import AudioStore
+from tts_backends import PCM_SAMPLE_RATE, OpenAIBackend, PiperBackend, patch_wav_sizes
+
 # --- Configuration ---
 WHISPER_MODEL_NAME = "base"  # Options: "tiny", "base", "small", "medium", "large"
+# Upper bound on memory held by cached Whisper models; least recently used ones are evicted
+WHISPER_MODEL_MEMORY_BUDGET_MB = int(
+    os.environ.get("WHISPER_MODEL_MEMORY_BUDGET_MB", "2048")
+)
 OLLAMA_MODEL_NAME = (
     "llama3.2"  # Ensure this model is pulled in Ollama (e.g., `ollama pull llama3`)
 )
+OLLAMA_TEMPERATURE = 0.75
 # Get Ollama host from environment variable or use default
 OLLAMA_HOST = os.environ.get("OLLAMA_HOST", "https://76bb-34-83-205-116.ngrok-free.app")
 
@@ -76,21 +103,120 @@ OLLAMA_HOST = os.environ.get("OLLAMA_HOST", "https://76bb-34-83-205-116.ngrok-fr
 OPENAI_TTS_MODEL = "tts-1"  # Standard model: "tts-1" or "tts-1-hd" for higher quality
 OPENAI_TTS_VOICE = "shimmer"  # Changed from "nova" to "shimmer". Other options: 'alloy', 'echo', 'fable', 'onyx'.
 OPENAI_TTS_OUTPUT_FILENAME = "speech.mp3"  # Output file for OpenAI TTS
+OPENAI_TTS_PCM_SAMPLE_RATE = PCM_SAMPLE_RATE  # OpenAI "pcm" format: 24kHz, 16-bit, mono
+# Pipelined TTS: sentences are synthesized while the LLM is still generating
+TTS_PIPELINE_WORKERS = 3  # Sentences synthesized in parallel
+TTS_MIN_SENTENCE_CHARS = 20  # Shorter fragments are merged with the next sentence
+TTS_STREAM_CHUNK_BYTES = 4096  # Audio forwarded per chunk when streaming speech
+# Speech engine: "openai" (network API) or "piper" (offline CPU voice run in
+# TTS_LOCAL_WORKERS processes; voices from https://huggingface.co/rhasspy/piper-voices)
+TTS_BACKEND = os.environ.get("TTS_BACKEND", "openai")
+TTS_PIPER_MODEL = os.environ.get(
+    "TTS_PIPER_MODEL", os.path.join("voices", "en_US-lessac-medium.onnx")
+)
+TTS_LOCAL_WORKERS = int(os.environ.get("TTS_LOCAL_WORKERS", "2"))
+# Synthesized audio is stored under a hash of (model, voice, format, text), so any
+# text spoken before is replayed without calling the API; empty disables the cache
+TTS_CACHE_DIR = os.environ.get("TTS_CACHE_DIR", os.path.join("outputs", "tts_cache"))
+# Least recently used audio is evicted beyond this size or after this many seconds unused
+TTS_CACHE_MAX_MB = int(os.environ.get("TTS_CACHE_MAX_MB", "512"))
+TTS_CACHE_TTL = float(os.environ.get("TTS_CACHE_TTL", str(30 * 86400)))
+# Fixed lines the agent speaks; rendered once at startup and kept decoded in memory
+TTS_GREETING = "Hello there! I'm Orbit, your super friendly local assistant! How can I make your day awesome?"
+TTS_NOT_HEARD = "I didn't catch that. Could you please say it again?"
+TTS_NOT_UNDERSTOOD = (
+    "Sorry, I had trouble understanding what you said. Please try again."
+)
+TTS_LLM_TROUBLE = (
+    "I'm having a little trouble thinking right now. Please try again in a moment."
+)
+TTS_GOODBYE = "Goodbye! Have a great day."
+TTS_EXITING = "Okay, exiting now! Have a fantastic day!"
+TTS_SNAG = (
+    "Whoops! I hit a little snag. Let's try that again, or you can say quit to exit."
+)
+TTS_CANNED_PHRASES = [
+    TTS_GREETING,
+    TTS_NOT_HEARD,
+    TTS_NOT_UNDERSTOOD,
+    TTS_LLM_TROUBLE,
+    TTS_GOODBYE,
+    TTS_EXITING,
+    TTS_SNAG,
+]
 
 # --- RAG Configuration ---
 RAG_EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
 RAG_KNOWLEDGE_FILE = "knowledge_base.txt"
+RAG_INDEX_DIR = (
+    "rag_index"  # Persisted embeddings and FAISS index, reused across restarts
+)
+# Serve the FAISS index straight from its memory-mapped file, so worker processes
+# share one copy through the page cache instead of each holding their own
+RAG_MMAP_INDEX = os.environ.get("RAG_MMAP_INDEX", "1") == "1"
+# Seconds between checks of the knowledge files for changes (0 disables hot reload)
+RAG_WATCH_INTERVAL = float(os.environ.get("RAG_WATCH_INTERVAL", "0"))
+RAG_EMBED_BATCH_SIZE = 64
+# Knowledge files are split into paragraph-aligned chunks of at most this many words,
+# with this much overlap between consecutive chunks of one paragraph
+RAG_CHUNK_MAX_TOKENS = 128
+RAG_CHUNK_OVERLAP_TOKENS = 24
+RAG_TOP_K = 2
+# Cosine similarity below which a hit is treated as irrelevant and left out of the prompt
+RAG_MIN_SIMILARITY = float(os.environ.get("RAG_MIN_SIMILARITY", "0.3"))
+# Retrieval mode: "dense" (FAISS only), "lexical" (BM25 only) or "hybrid" (both, fused)
+RAG_RETRIEVAL_MODE = os.environ.get("RAG_RETRIEVAL_MODE", "hybrid")
+# Repeated queries skip the encoder and FAISS; cleared whenever the index changes
+RAG_QUERY_CACHE_SIZE = int(os.environ.get("RAG_QUERY_CACHE_SIZE", "2048"))
+RAG_QUERY_CACHE_TTL = float(os.environ.get("RAG_QUERY_CACHE_TTL", "3600"))
+# Concurrent query encodes are coalesced into batches of up to this size, waiting at
+# most this long for other queries to join (only when other requests are in flight)
+RAG_QUERY_BATCHING = os.environ.get("RAG_QUERY_BATCHING", "1") == "1"
+RAG_BATCH_MAX_SIZE = 32
+RAG_BATCH_MAX_WAIT_MS = 5
+RAG_RRF_K = 60  # Reciprocal-rank fusion damping constant
+RAG_MIN_LEXICAL_SCORE = (
+    0.2  # Normalized BM25 score below which lexical hits are ignored
+)
+# A lexical hit this strong (normalized BM25), and this far ahead of the runner-up,
+# is returned without encoding the query at all
+RAG_LEXICAL_SHORTCUT_SCORE = 0.6
+RAG_LEXICAL_SHORTCUT_MARGIN = 1.5
+# FAISS index: "auto" (by corpus size), "flat", "ivf_flat", "hnsw" or "ivf_pq"
+RAG_INDEX_TYPE = os.environ.get("RAG_INDEX_TYPE", "auto")
+RAG_IVF_NPROBE = int(os.environ.get("RAG_IVF_NPROBE", "16"))  # IVF lists scanned
+RAG_HNSW_EF_SEARCH = int(os.environ.get("RAG_HNSW_EF_SEARCH", "128"))  # HNSW beam width
+# Vector precision inside the index: "float32", "float16" (half the memory) or "int8"
+# (a quarter); see `python benchmarks.py rag-storage` for the recall trade-off
+RAG_VECTOR_STORAGE = os.environ.get("RAG_VECTOR_STORAGE", "float32")
 
 # --- Audio Recording Configuration ---
 AUDIO_SAMPLE_RATE = 16000  # For recording, Whisper prefers 16kHz
 AUDIO_CHANNELS = 1
 # VAD (Voice Activity Detection) parameters
-AUDIO_CHUNK_DURATION_MS = (
-    300  # Duration of each audio chunk for VAD analysis in milliseconds
+AUDIO_CHUNK_DURATION_MS = 30  # Audio read from the microphone per block
+SILENCE_THRESHOLD = (
+    0.008  # RMS energy below this is always silence (adjust based on mic/environment)
 )
-SILENCE_THRESHOLD = 0.008  # RMS energy below this is considered silence (adjust based on mic/environment)
-END_OF_SPEECH_SILENCE_DURATION = 1.5  # Seconds of silence to consider speech ended
+END_OF_SPEECH_SILENCE_DURATION = 1.0  # Seconds of silence to consider speech ended
 MAX_RECORD_DURATION = 20  # Maximum seconds to record if silence is not detected
+# Streaming VAD (SpeechDetector): speech/silence is decided per short frame
+VAD_FRAME_MS = 30
+VAD_MIN_SPEECH_MS = 90  # Voiced audio needed before speech is considered started
+VAD_PRE_ROLL_MS = 300  # Audio kept from before the onset so soft word starts survive
+VAD_TRAILING_PAD_MS = 200  # Silence kept after the last voiced frame of a recording
+# Adaptive noise floor: frames must be VAD_NOISE_RATIO times louder than the
+# background level, which tracks quiet frames with this smoothing factor per frame
+VAD_NOISE_RATIO = 3.0
+VAD_NOISE_ADAPT_RATE = 0.05
+VAD_CALIBRATION_MS = (
+    150  # Audio at the start of a stream that only measures the background
+)
+# Streaming STT: partial transcripts are decoded every STT_STREAM_STEP seconds of new
+# audio while the user speaks; words two decodes agree on are committed
+STT_STREAM_STEP = 1.0
+STT_STREAM_MAX_WINDOW = 20  # Seconds of unconfirmed audio before it is committed anyway
+STT_STREAM_PROMPT_CHARS = 200  # Committed text passed to Whisper as context
 
 OUTPUT_DIR = "outputs"
 os.makedirs(OUTPUT_DIR, exist_ok=True)
@@ -116,14 +242,11 @@ class Microphone:
         self.channels = channels
         self.chunk_size = int(self.sample_rate * AUDIO_CHUNK_DURATION_MS / 1000)
         print(
-            f"{CYAN}[Microphone] Initialized. Chunk size for VAD: {self.chunk_size} frames.{RESET_COLOR}"
+            f"{CYAN}[Microphone] Initialized. Block size: {self.chunk_size} frames.{RESET_COLOR}"
         )
 
-    def _calculate_rms(self, audio_chunk):
-        """Calculates the Root Mean Square of an audio chunk."""
-        return np.sqrt(np.mean(audio_chunk**2))
-
-    def listen(self):
+    def listen(self, on_audio=None):
+        """Record one utterance; ``on_audio`` is called with each chunk as it arrives."""
         print(
             f"\n{PINK}🎤 Listening... (Press ENTER to start, speak, then pause. Or type your input){RESET_COLOR}"
         )
@@ -145,14 +268,15 @@ class Microphone:
             f"{CYAN}   Recording... Speak now. Recording will stop after {END_OF_SPEECH_SILENCE_DURATION}s of silence or max {MAX_RECORD_DURATION}s.{RESET_COLOR}"
         )
 
-        recorded_frames = []
-        silent_chunks_count = 0
-        total_chunks_recorded = 0
-
-        chunks_for_silence_duration = int(
-            END_OF_SPEECH_SILENCE_DURATION * 1000 / AUDIO_CHUNK_DURATION_MS
+        detector = SpeechDetector(sample_rate=self.sample_rate)
+        # Speech is written into a buffer sized for the longest possible recording
+        captured = np.empty(
+            int((MAX_RECORD_DURATION + VAD_PRE_ROLL_MS / 1000) * self.sample_rate),
+            dtype=np.float32,
         )
-        max_chunks_to_record = int(MAX_RECORD_DURATION * 1000 / AUDIO_CHUNK_DURATION_MS)
+        length = 0
+        max_blocks = int(MAX_RECORD_DURATION * 1000 / AUDIO_CHUNK_DURATION_MS)
+        speech_ended = False
 
         try:
             with sd.InputStream(
@@ -161,52 +285,48 @@ class Microphone:
                 dtype="float32",
                 blocksize=self.chunk_size,
             ) as stream:
-                # start_time = time.time() # Not strictly needed with chunk counting
-                while True:
+                for _ in range(max_blocks):
                     audio_chunk, overflowed = stream.read(self.chunk_size)
                     if overflowed:
                         print(
                             f"{YELLOW}   Warning: Audio input overflowed!{RESET_COLOR}"
                         )
 
-                    recorded_frames.append(audio_chunk)
-                    total_chunks_recorded += 1
-
-                    rms = self._calculate_rms(audio_chunk)
-                    # print(f"RMS: {rms:.4f}") # For debugging VAD threshold
-
-                    if rms < SILENCE_THRESHOLD:
-                        silent_chunks_count += 1
-                    else:
-                        # If speech is detected, ensure we record a bit more even if it was silent before
-                        # This helps capture leading soft sounds if SILENCE_THRESHOLD is aggressive
-                        if silent_chunks_count > 0:
-                            print(
-                                f"{CYAN}   Speech detected after brief silence.{RESET_COLOR}"
-                            )
-                        silent_chunks_count = 0
-
-                    if silent_chunks_count >= chunks_for_silence_duration:
+                    # Downmix to mono; leading silence before the pre-roll is dropped
+                    for event, audio in detector.process(audio_chunk.mean(axis=1)):
+                        if event == "start":
+                            print(f"{CYAN}   Speech detected.{RESET_COLOR}")
+                        if audio is not None:
+                            audio = audio[: len(captured) - length]
+                            captured[length : length + len(audio)] = audio
+                            length += len(audio)
+                            if on_audio:
+                                on_audio(audio)
+                        if event == "end":
+                            speech_ended = True
+                    if speech_ended:
                         print(
                             f"{CYAN}   End of speech detected after {END_OF_SPEECH_SILENCE_DURATION}s of silence.{RESET_COLOR}"
                         )
                         break
+                else:
+                    print(
+                        f"{CYAN}   Maximum recording duration of {MAX_RECORD_DURATION}s reached.{RESET_COLOR}"
+                    )
 
-                    if total_chunks_recorded >= max_chunks_to_record:
-                        print(
-                            f"{CYAN}   Maximum recording duration of {MAX_RECORD_DURATION}s reached.{RESET_COLOR}"
-                        )
-                        break
-
-            if not recorded_frames:
-                print(f"{YELLOW}   No audio recorded.{RESET_COLOR}")
+            if not length:
+                print(f"{YELLOW}   No speech detected.{RESET_COLOR}")
                 return None
 
-            audio_data = np.concatenate(recorded_frames, axis=0)
+            if speech_ended:
+                # Whisper doesn't need the silence that confirmed the end of speech
+                trailing_pad = int(self.sample_rate * VAD_TRAILING_PAD_MS / 1000)
+                length -= max(0, detector.end_silence_samples - trailing_pad)
+            audio_data = captured[:length].copy()
             print(
                 f"{CYAN}   Recording finished. Total duration: {len(audio_data)/self.sample_rate:.2f}s{RESET_COLOR}"
             )
-            return audio_data.flatten() if audio_data.ndim > 1 else audio_data
+            return audio_data
 
         except Exception as e:
             print(
@@ -231,28 +351,238 @@ class Microphone:
             return None
 
 
-class WhisperSTT:
-    def __init__(self, model_name=WHISPER_MODEL_NAME):
-        if not whisper:
-            print(
-                f"{YELLOW}Whisper library not available. STT will not function.{RESET_COLOR}"
-            )
-            self.model = None
+class SpeechDetector:
+    """Streaming voice activity detection on short fixed-size frames.
+
+    ``process`` accepts chunks of any length and returns events in order:
+    ``("start", audio)`` when speech begins, where ``audio`` includes up to
+    ``pre_roll_ms`` of audio before the onset; ``("audio", audio)`` for audio
+    that follows while speech is ongoing; ``("end", None)`` once
+    ``end_silence`` seconds of silence have passed.
+
+    A frame is voiced when its RMS exceeds both ``threshold`` and
+    ``noise_ratio`` times the noise floor, an average of recent silent frames,
+    so a fan or a noisy room does not keep the detector in speech. The quiet
+    frames among the first ``calibration_ms`` of audio set the initial floor;
+    speech-level ones are left out of it, so talking right away is still heard.
+    """
+
+    def __init__(
+        self,
+        sample_rate=AUDIO_SAMPLE_RATE,
+        frame_ms=VAD_FRAME_MS,
+        threshold=SILENCE_THRESHOLD,
+        min_speech_ms=VAD_MIN_SPEECH_MS,
+        end_silence=END_OF_SPEECH_SILENCE_DURATION,
+        pre_roll_ms=VAD_PRE_ROLL_MS,
+        noise_ratio=VAD_NOISE_RATIO,
+        noise_adapt_rate=VAD_NOISE_ADAPT_RATE,
+        calibration_ms=VAD_CALIBRATION_MS,
+    ):
+        self.frame_size = int(sample_rate * frame_ms / 1000)
+        self.threshold = threshold
+        self.noise_ratio = noise_ratio
+        self.noise_adapt_rate = noise_adapt_rate
+        self.noise_floor = threshold / noise_ratio if noise_ratio else 0.0
+        self._calibration_frames = round(calibration_ms / frame_ms)
+        self._calibration_rms = []
+        self.min_speech_frames = max(1, round(min_speech_ms / frame_ms))
+        self.end_silence_frames = max(1, round(end_silence * 1000 / frame_ms))
+        # Silence at the end of the audio emitted before an "end" event
+        self.end_silence_samples = self.end_silence_frames * self.frame_size
+        self.in_speech = False
+        self._pre_roll = collections.deque(
+            maxlen=round(pre_roll_ms / frame_ms) + self.min_speech_frames
+        )
+        self._remainder = np.zeros(0, dtype=np.float32)
+        self._voiced_run = 0
+        self._silent_run = 0
+
+    def process(self, chunk):
+        audio = np.concatenate(
+            [self._remainder, np.asarray(chunk, dtype=np.float32).reshape(-1)]
+        )
+        num_frames = len(audio) // self.frame_size
+        self._remainder = audio[num_frames * self.frame_size :].copy()
+        if not num_frames:
+            return []
+        frames = audio[: num_frames * self.frame_size].reshape(num_frames, -1)
+        rms = np.sqrt(np.mean(frames**2, axis=1))
+        calibrating = min(
+            num_frames, self._calibration_frames - len(self._calibration_rms)
+        )
+        calibrating = max(calibrating, 0)
+        self._calibration_rms.extend(rms[:calibrating].tolist())
+        # Speech-level frames are left out, so talking straight away cannot raise
+        # the floor above the user's own voice; all-speech calibration keeps the
+        # fixed threshold.
+        quiet = [value for value in self._calibration_rms if value < self.threshold]
+        if calibrating and quiet:
+            self.noise_floor = float(np.mean(quiet))
+        voiced = rms >= max(self.threshold, self.noise_floor * self.noise_ratio)
+        self._update_noise_floor(rms[calibrating:][~voiced[calibrating:]])
+
+        events, speech = [], []
+        for frame, is_voiced in zip(frames, voiced):
+            if not self.in_speech:
+                self._pre_roll.append(frame)
+                self._voiced_run = self._voiced_run + 1 if is_voiced else 0
+                if self._voiced_run >= self.min_speech_frames:
+                    events.append(("start", np.concatenate(self._pre_roll)))
+                    self._pre_roll.clear()
+                    self.in_speech, self._silent_run = True, 0
+                continue
+            speech.append(frame)
+            self._silent_run = 0 if is_voiced else self._silent_run + 1
+            if self._silent_run >= self.end_silence_frames:
+                events.append(("audio", np.concatenate(speech)))
+                events.append(("end", None))
+                speech = []
+                self.in_speech, self._voiced_run = False, 0
+        if speech:
+            events.append(("audio", np.concatenate(speech)))
+        return events
+
+    def _update_noise_floor(self, quiet_rms):
+        # Exponential average over the chunk's silent frames, applied in one step
+        if not len(quiet_rms) or not self.noise_ratio:
             return
-        try:
+        weight = 1.0 - (1.0 - self.noise_adapt_rate) ** len(quiet_rms)
+        self.noise_floor += weight * (float(np.mean(quiet_rms)) - self.noise_floor)
+
+
+class WhisperModelRegistry:
+    """Process-wide cache of loaded Whisper models.
+
+    Models are loaded lazily by name and kept until the memory budget is
+    exceeded, at which point the least recently used ones are evicted.
+
+    A model is not safe to run from two threads at once: during decoding
+    Whisper installs KV-cache hooks on the shared decoder modules (and word
+    timestamps hook cross-attention), so concurrent decodes overwrite each
+    other's caches. Callers hold ``inference_lock(name)`` around every use.
+    """
+
+    def __init__(self, memory_budget_mb=WHISPER_MODEL_MEMORY_BUDGET_MB):
+        self.memory_budget_bytes = memory_budget_mb * 1024 * 1024
+        self._models = collections.OrderedDict()  # name -> (model, size_bytes)
+        self._inference_locks = {}  # name -> lock serializing decodes on that model
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def _model_size_bytes(model):
+        return sum(p.numel() * p.element_size() for p in model.parameters())
+
+    def get(self, model_name=WHISPER_MODEL_NAME):
+        """Return the loaded model for ``model_name``, loading it if needed."""
+        with self._lock:
+            if model_name in self._models:
+                self._models.move_to_end(model_name)
+                return self._models[model_name][0]
+            if not whisper:
+                return None
             print(
                 f"{CYAN}[STT Engine] Loading Whisper model: {model_name}...{RESET_COLOR}"
             )
-            self.model = whisper.load_model(model_name)
+            model = whisper.load_model(model_name)
+            self._models[model_name] = (model, self._model_size_bytes(model))
             print(
                 f"{CYAN}[STT Engine] Whisper model '{model_name}' loaded.{RESET_COLOR}"
             )
+            self._evict(keep=model_name)
+            return model
+
+    def _evict(self, keep):
+        while self.memory_usage() > self.memory_budget_bytes and len(self._models) > 1:
+            name = next(n for n in self._models if n != keep)
+            self._models.pop(name)
+            print(
+                f"{CYAN}[STT Engine] Evicted Whisper model '{name}' (memory budget).{RESET_COLOR}"
+            )
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+
+    def inference_lock(self, model_name=WHISPER_MODEL_NAME):
+        # Kept across evictions, so a reloaded model shares the lock of the old one
+        with self._lock:
+            return self._inference_locks.setdefault(model_name, threading.Lock())
+
+    def memory_usage(self):
+        with self._lock:
+            return sum(size for _, size in self._models.values())
+
+    def loaded_models(self):
+        with self._lock:
+            return list(self._models)
+
+    def warmup(self, model_names=(WHISPER_MODEL_NAME,)):
+        """Load models and run one short transcription so kernels are initialised."""
+        silence = np.zeros(AUDIO_SAMPLE_RATE, dtype=np.float32)
+        for name in model_names:
+            try:
+                model = self.get(name)
+                if model is not None:
+                    with self.inference_lock(name):
+                        model.transcribe(silence, fp16=torch.cuda.is_available())
+            except Exception as e:
+                print(
+                    f"{YELLOW}[STT Engine] Warm-up failed for Whisper model '{name}': {e}{RESET_COLOR}"
+                )
+
+
+whisper_registry = WhisperModelRegistry()
+
+
+class WhisperSTT:
+    def __init__(self, model_name=WHISPER_MODEL_NAME, registry=None):
+        self.model_name = model_name
+        self.registry = registry or whisper_registry
+        if not whisper:
+            print(
+                f"{YELLOW}Whisper library not available. STT will not function.{RESET_COLOR}"
+            )
+            return
+        try:
+            self.registry.get(model_name)
         except Exception as e:
             print(f"{YELLOW}[STT Engine] Error loading Whisper model: {e}{RESET_COLOR}")
-            self.model = None
+
+    @property
+    def model(self):
+        """The shared model for ``model_name``; reloaded if it was evicted."""
+        try:
+            return self.registry.get(self.model_name)
+        except Exception as e:
+            print(f"{YELLOW}[STT Engine] Error loading Whisper model: {e}{RESET_COLOR}")
+            return None
+
+    def warmup(self):
+        self.registry.warmup((self.model_name,))
+
+    def transcribe_words(self, audio, initial_prompt=None, language=None):
+        """Raw Whisper result with word timestamps, or ``None`` on failure."""
+        model = self.model
+        if model is None or not len(audio):
+            return None
+        try:
+            # Streaming sessions decode from their own threads, outside the stt
+            # stage; the lock keeps them from running on the model concurrently
+            with self.registry.inference_lock(self.model_name):
+                return model.transcribe(
+                    audio,
+                    fp16=torch.cuda.is_available(),
+                    language=language,
+                    word_timestamps=True,
+                    initial_prompt=initial_prompt,
+                    condition_on_previous_text=False,
+                )
+        except Exception as e:
+            print(f"{YELLOW}[STT Engine] Error during transcription: {e}{RESET_COLOR}")
+            return None
 
     def transcribe(self, audio_data_or_text):
-        if self.model is None:
+        model = self.model
+        if model is None:
             print(
                 f"{YELLOW}[STT Engine] Model not loaded. Cannot transcribe.{RESET_COLOR}"
             )
@@ -276,9 +606,10 @@ class WhisperSTT:
             print(
                 f"{CYAN}[STT Engine] Transcribing audio (length: {len(audio_data_or_text)/AUDIO_SAMPLE_RATE:.2f}s)...{RESET_COLOR}"
             )
-            result = self.model.transcribe(
-                audio_data_or_text, fp16=torch.cuda.is_available(), language=None
-            )
+            with self.registry.inference_lock(self.model_name):
+                result = model.transcribe(
+                    audio_data_or_text, fp16=torch.cuda.is_available(), language=None
+                )
             transcribed_text = result["text"].strip()
 
             if not transcribed_text:
@@ -296,17 +627,183 @@ class WhisperSTT:
             return None
 
 
+class StreamingTranscriber:
+    """Transcribes an utterance while it is still being recorded.
+
+    ``feed`` takes audio chunks as they are recorded. Every ``step`` seconds of
+    new audio a worker thread decodes the unconfirmed tail of the recording;
+    the leading words on which two consecutive decodes agree are committed and
+    the audio behind them is dropped. ``finish`` then only has to decode the
+    last few words after the user stops speaking.
+    """
+
+    def __init__(
+        self,
+        stt,
+        sample_rate=AUDIO_SAMPLE_RATE,
+        step=STT_STREAM_STEP,
+        max_window=STT_STREAM_MAX_WINDOW,
+        on_update=None,
+    ):
+        self.stt = stt
+        self.on_update = on_update  # Called with the committed text after each commit
+        self.sample_rate = sample_rate
+        self.step_samples = int(step * sample_rate)
+        self.max_window_samples = int(max_window * sample_rate)
+        self.committed = []  # Confirmed words
+        self.decodes = 0
+        self.language = None  # Detected on the first decode, then kept fixed
+        self._pending = []  # Chunks fed since the last decode
+        self._pending_samples = 0
+        self._window = np.zeros(0, dtype=np.float32)  # Unconfirmed audio
+        self._window_start = 0.0  # Its offset in the utterance, in seconds
+        self._hypothesis = []  # Unconfirmed (word, end_seconds) from the last decode
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self._worker = threading.Thread(
+            target=self._run, name="orbit-stt-stream", daemon=True
+        )
+        self._worker.start()
+
+    def feed(self, audio_chunk):
+        chunk = np.asarray(audio_chunk, dtype=np.float32).reshape(-1)
+        with self._lock:
+            self._pending.append(chunk.copy())
+            self._pending_samples += len(chunk)
+            if self._pending_samples >= self.step_samples:
+                self._wake.set()
+
+    def finish(self):
+        """Stop streaming, decode the remaining audio and return the full transcript."""
+        self._close()
+        self._take_pending()
+        # Skip a trailing stretch of pure silence, which Whisper tends to hallucinate on
+        if len(self._window) and (
+            self._hypothesis or np.sqrt(np.mean(self._window**2)) >= SILENCE_THRESHOLD
+        ):
+            self.committed.extend(word for word, _ in self._decode())
+        text = " ".join(self.committed).strip()
+        return text or None
+
+    def cancel(self):
+        self._close()
+
+    def _close(self):
+        self._closed = True
+        self._wake.set()
+        self._worker.join()
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            if self._closed:
+                return
+            new_audio = self._take_pending()
+            # Nothing new to recognise while the user is silent
+            if np.sqrt(np.mean(new_audio**2)) >= SILENCE_THRESHOLD:
+                self._advance()
+
+    def _take_pending(self):
+        with self._lock:
+            chunks, self._pending, self._pending_samples = self._pending, [], 0
+        new_audio = np.concatenate(chunks) if chunks else self._window[:0]
+        self._window = np.concatenate([self._window, new_audio])
+        return new_audio
+
+    def _advance(self):
+        words = self._decode()
+        agreed = 0
+        for (word, _), (previous, _) in zip(words, self._hypothesis):
+            if self._normalize(word) != self._normalize(previous):
+                break
+            agreed += 1
+        if len(self._window) > self.max_window_samples:
+            agreed = len(words)  # Keep the decode window bounded
+        self._hypothesis = words[agreed:]
+        if not agreed:
+            return
+        self.committed.extend(word for word, _ in words[:agreed])
+        cut = int((words[agreed - 1][1] - self._window_start) * self.sample_rate)
+        cut = max(0, min(cut, len(self._window)))
+        self._window = self._window[cut:]
+        self._window_start += cut / self.sample_rate
+        if self.on_update:
+            self.on_update(" ".join(self.committed))
+        else:
+            print(f"{CYAN}[STT Stream] {' '.join(self.committed)} …{RESET_COLOR}")
+
+    def _decode(self):
+        prompt = " ".join(self.committed)[-STT_STREAM_PROMPT_CHARS:] or None
+        result = self.stt.transcribe_words(
+            self._window, initial_prompt=prompt, language=self.language
+        )
+        self.decodes += 1
+        if not result:
+            return []
+        self.language = self.language or result["language"]
+        return [
+            (word["word"].strip(), self._window_start + word["end"])
+            for segment in result["segments"]
+            for word in segment.get("words", [])
+            if word["word"].strip()
+        ]
+
+    @staticmethod
+    def _normalize(word):
+        return re.sub(r"[^\w']", "", word.lower())
+
+
+RetrievalHit = collections.namedtuple("RetrievalHit", ["doc_id", "text", "score"])
+
+# Everything a query reads, swapped as one object so a reload is atomic for readers.
+# ``fingerprint`` identifies the source files it was built from.
+RAGState = collections.namedtuple(
+    "RAGState",
+    ["version", "documents", "embeddings", "index", "lexical_index", "fingerprint"],
+)
+
+
 class LocalRAG:
     def __init__(
         self,
         knowledge_file=RAG_KNOWLEDGE_FILE,
         embedding_model_name=RAG_EMBEDDING_MODEL_NAME,
+        index_dir=RAG_INDEX_DIR,
+        index_type=RAG_INDEX_TYPE,
+        nprobe=RAG_IVF_NPROBE,
+        ef_search=RAG_HNSW_EF_SEARCH,
+        retrieval_mode=RAG_RETRIEVAL_MODE,
+        vector_storage=RAG_VECTOR_STORAGE,
+        mmap_index=RAG_MMAP_INDEX,
     ):
+        self.knowledge_file = knowledge_file
+        self.embedding_model_name = embedding_model_name
+        self.retrieval_mode = retrieval_mode
+        self.index_type = index_type
+        self.nprobe = nprobe
+        self.ef_search = ef_search
+        self.vector_storage = vector_storage
+        self.mmap_index = mmap_index
+        self.index_store = IndexStore(
+            index_dir, {"embedding_model": embedding_model_name, "normalized": True}
+        )
+        self._versions = itertools.count(1)
+        self.state = self._empty_state()
+        self._reload_lock = threading.Lock()
+        self._reload_thread = None
+        self._reload_requested = False
+        self._watcher = None
+        self._stop_watching = threading.Event()
+        self.query_batcher = None
+        self.embedding_cache = TTLCache(RAG_QUERY_CACHE_SIZE, RAG_QUERY_CACHE_TTL)
+        self.result_cache = TTLCache(RAG_QUERY_CACHE_SIZE, RAG_QUERY_CACHE_TTL)
+        self.embedding_model = None
         if not SentenceTransformer or not faiss:
             print(
                 f"{YELLOW}SentenceTransformer or FAISS not available. RAG will be basic.{RESET_COLOR}"
             )
-            self.embedding_model, self.index, self.documents = None, None, []
             self._load_basic_knowledge(knowledge_file)
             return
         print(f"{CYAN}[RAG System] Initializing Local RAG...{RESET_COLOR}")
@@ -316,87 +813,403 @@ class LocalRAG:
             )
             self.embedding_model = SentenceTransformer(embedding_model_name)
             print(f"{CYAN}  Embedding model loaded.{RESET_COLOR}")
-            self.documents, self.index = [], None
+            if RAG_QUERY_BATCHING:
+                self.query_batcher = EmbeddingBatcher(
+                    self._encode_queries, RAG_BATCH_MAX_SIZE, RAG_BATCH_MAX_WAIT_MS
+                )
             self._build_index_from_file(knowledge_file)
         except Exception as e:
             print(f"{YELLOW}  Error initializing RAG system: {e}{RESET_COLOR}")
-            self.embedding_model, self.index, self.documents = None, None, []
+            self.embedding_model = None
             self._load_basic_knowledge(knowledge_file)
 
+    @staticmethod
+    def _sources(knowledge_file):
+        # A single path, or a list of files and directories to ingest
+        if isinstance(knowledge_file, (str, os.PathLike)):
+            return [knowledge_file]
+        return list(knowledge_file)
+
+    def _empty_state(self, fingerprint=None):
+        return RAGState(next(self._versions), [], None, None, BM25Index(), fingerprint)
+
     def _load_basic_knowledge(self, knowledge_file):
-        self.knowledge_base_fallback = {}
         try:
-            if os.path.exists(knowledge_file):
-                with open(knowledge_file, "r", encoding="utf-8") as f:
-                    for i, line in enumerate(f):
-                        self.knowledge_base_fallback[f"doc_{i}"] = line.strip()
-                # print(f"{CYAN}[RAG System] Basic knowledge loaded from {knowledge_file} (fallback mode).{RESET_COLOR}") # Less verbose
-            else:
-                print(
-                    f"{YELLOW}[RAG System] Knowledge file {knowledge_file} not found (fallback mode).{RESET_COLOR}"
-                )
+            self._swap(self._basic_state(self._sources(knowledge_file)))
+            # print(f"{CYAN}[RAG System] Basic knowledge loaded from {knowledge_file} (fallback mode).{RESET_COLOR}") # Less verbose
         except Exception as e:
             print(f"{YELLOW}Error loading basic RAG knowledge: {e}{RESET_COLOR}")
 
+    def _basic_state(self, sources):
+        fingerprint = source_fingerprint(sources)
+        if not any(os.path.exists(source) for source in sources):
+            print(
+                f"{YELLOW}[RAG System] Knowledge file {self.knowledge_file} not found (fallback mode).{RESET_COLOR}"
+            )
+            return self._empty_state(fingerprint)
+        documents = [
+            chunk.text
+            for chunk in iter_corpus_chunks(
+                sources, RAG_CHUNK_MAX_TOKENS, RAG_CHUNK_OVERLAP_TOKENS
+            )
+        ]
+        return RAGState(
+            next(self._versions),
+            documents,
+            None,
+            None,
+            BM25Index.build(documents),
+            fingerprint,
+        )
+
     def _build_index_from_file(self, knowledge_file):
-        if not self.embedding_model:
-            return
         try:
-            if not os.path.exists(knowledge_file):
+            self._swap(self._build_state(knowledge_file))
+            # print(f"{CYAN}  FAISS index built with {self.index.ntotal} vectors.{RESET_COLOR}") # Less verbose
+        except Exception as e:
+            print(f"{YELLOW}  Error building FAISS index: {e}{RESET_COLOR}")
+            self._swap(self._empty_state())
+
+    def _build_state(self, knowledge_file):
+        sources = self._sources(knowledge_file)
+        if not self.embedding_model:
+            return self._basic_state(sources)
+        if len(sources) == 1 and not os.path.exists(sources[0]):
+            print(
+                f"{YELLOW}  Knowledge file '{knowledge_file}' not found. Creating sample.{RESET_COLOR}"
+            )
+            with open(sources[0], "w", encoding="utf-8") as f:
+                f.write("Default knowledge: Ollama runs LLMs locally.\n")
+            print(f"{CYAN}  Created a sample '{knowledge_file}'.{RESET_COLOR}")
+        return self._load_or_build_index(sources)
+
+    def _swap(self, state):
+        # Queries grab ``self.state`` once, so they see either the old or the new
+        # state in full. Cached results are keyed by state version as well, so a
+        # query that straddles the swap cannot repopulate the cache with stale hits.
+        self.state = state
+        self.result_cache.clear()
+
+    def reload(self, knowledge_file=None, wait=False):
+        """Rebuild the knowledge base in a background thread and swap it in when ready.
+
+        Queries keep being served from the current state meanwhile. Only chunks
+        that are new or changed are embedded. Requests made while a rebuild is
+        running are coalesced into one more rebuild. Returns the reload thread.
+        """
+        if knowledge_file is not None:
+            self.knowledge_file = knowledge_file
+        with self._reload_lock:
+            self._reload_requested = True
+            if self._reload_thread is None:
+                self._reload_thread = threading.Thread(
+                    target=self._reload_worker, name="rag-reload", daemon=True
+                )
+                self._reload_thread.start()
+            thread = self._reload_thread
+        if wait:
+            thread.join()
+        return thread
+
+    def _reload_worker(self):
+        while True:
+            with self._reload_lock:
+                if not self._reload_requested:
+                    self._reload_thread = None
+                    return
+                self._reload_requested = False
+            start_time = time.time()
+            try:
+                state = self._build_state(self.knowledge_file)
+            except Exception as e:
                 print(
-                    f"{YELLOW}  Knowledge file '{knowledge_file}' not found. Creating sample.{RESET_COLOR}"
+                    f"{YELLOW}[RAG System] Reload failed, keeping the current index: {e}{RESET_COLOR}"
                 )
-                with open(knowledge_file, "w", encoding="utf-8") as f:
-                    f.write("Default knowledge: Ollama runs LLMs locally.\n")
-                print(f"{CYAN}  Created a sample '{knowledge_file}'.{RESET_COLOR}")
-
-            with open(knowledge_file, "r", encoding="utf-8") as f:
-                self.documents = [ln.strip() for ln in f if ln.strip()]
-            if not self.documents:
-                # print(f"{YELLOW}  No documents found in knowledge file. RAG may not be effective.{RESET_COLOR}") # Less verbose
-                return
+                continue
+            self._swap(state)
+            print(
+                f"{CYAN}[RAG System] Knowledge base reloaded ({len(state.documents)} chunks) in {time.time() - start_time:.2f}s.{RESET_COLOR}"
+            )
 
-            # print(f"{CYAN}  Embedding {len(self.documents)} documents for RAG...{RESET_COLOR}") # Less verbose
-            doc_embeddings = self.embedding_model.encode(
-                self.documents, convert_to_tensor=False
+    def watch(self, interval=RAG_WATCH_INTERVAL):
+        """Poll the knowledge sources every ``interval`` seconds and reload on change."""
+        if self._watcher is not None or interval <= 0:
+            return
+        self._stop_watching.clear()
+
+        def poll():
+            while not self._stop_watching.wait(interval):
+                try:
+                    fingerprint = source_fingerprint(self._sources(self.knowledge_file))
+                except OSError:
+                    continue
+                if fingerprint != self.state.fingerprint and not self.reloading:
+                    self.reload()
+
+        self._watcher = threading.Thread(target=poll, name="rag-watch", daemon=True)
+        self._watcher.start()
+
+    def stop_watching(self):
+        self._stop_watching.set()
+        self._watcher = None
+
+    @property
+    def reloading(self):
+        return self._reload_thread is not None
+
+    def status(self):
+        state = self.state
+        return {
+            "version": state.version,
+            "chunks": len(state.documents),
+            "index": type(state.index).__name__ if state.index is not None else None,
+            "reloading": self.reloading,
+            "watching": self._watcher is not None,
+        }
+
+    def cache_stats(self):
+        return {
+            "embeddings": self.embedding_cache.stats(),
+            "results": self.result_cache.stats(),
+            "batching": self.query_batcher.stats() if self.query_batcher else None,
+        }
+
+    def _index_config(self, num_vectors, dim):
+        return resolve_index_config(
+            num_vectors, dim, self.index_type, metric="ip", storage=self.vector_storage
+        )
+
+    def _load_or_build_index(self, sources):
+        """Load the persisted index, or ingest the sources and build a new version.
+
+        The saved version is used as-is when the source files are unchanged.
+        Otherwise the sources are re-chunked and only chunks whose content hash
+        is not in the saved version are embedded.
+        """
+        store = self.index_store
+        # Workers noticing the same change build it once; the rest wait and map it
+        with store.build_lock():
+            version_dir = store.current_version()
+            manifest = store.load_manifest(version_dir)
+            fingerprint = source_fingerprint(sources)
+            if manifest and manifest["sources"] == fingerprint:
+                index_config = self._index_config(manifest["count"], manifest["dim"])
+                if manifest["index_config"] == index_config:
+                    index = store.load_index(version_dir, mmap=self.mmap_index)
+                    if index is not None and index.ntotal == manifest["count"]:
+                        print(
+                            f"{CYAN}  Loaded persisted FAISS index ({index.ntotal} vectors).{RESET_COLOR}"
+                        )
+                        return self._open_state(version_dir, manifest, index)
+
+            cached_chunks = cached_embeddings = cached_lexical = None
+            if manifest and manifest["count"]:
+                cached_chunks = ChunkStore(version_dir)
+                cached_embeddings = store.load_embeddings(
+                    version_dir, manifest["count"], manifest["dim"]
+                )
+                try:
+                    cached_lexical = BM25Index.load(version_dir)
+                except OSError:
+                    pass  # Written before the BM25 postings were persisted
+
+            new_dir = store.new_version()
+            stats = ingest(
+                sources,
+                new_dir,
+                self._encode_documents,
+                cached_chunks,
+                cached_embeddings,
+                max_tokens=RAG_CHUNK_MAX_TOKENS,
+                overlap_tokens=RAG_CHUNK_OVERLAP_TOKENS,
+                embeddings_file=IndexStore.EMBEDDINGS_FILE,
             )
-            self.index = faiss.IndexFlatL2(doc_embeddings.shape[1])
-            self.index.add(doc_embeddings)
-            # print(f"{CYAN}  FAISS index built with {self.index.ntotal} vectors.{RESET_COLOR}") # Less verbose
-        except Exception as e:
-            print(f"{YELLOW}  Error building FAISS index: {e}{RESET_COLOR}")
-            self.index, self.documents = None, []
+            print(
+                f"{CYAN}  Ingested {stats['chunks']} chunks: {stats['embedded']} embedded, "
+                f"{stats['reused']} reused from cache.{RESET_COLOR}"
+            )
+            dim = (
+                stats["dim"] or self.embedding_model.get_sentence_embedding_dimension()
+            )
+            embeddings = store.load_embeddings(new_dir, stats["chunks"], dim)
+            index_config = self._index_config(stats["chunks"], dim)
+            print(
+                f"{CYAN}  Building '{index_config['type']}' FAISS index over {stats['chunks']} vectors...{RESET_COLOR}"
+            )
+            index = build_index(embeddings, index_config)
+            lexical_index = BM25Index.build(
+                ChunkStore(new_dir), cached_chunks, cached_lexical
+            )
+            manifest = {
+                "sources": fingerprint,
+                "count": stats["chunks"],
+                "dim": dim,
+                "index_config": index_config,
+            }
+            try:
+                lexical_index.save(new_dir)
+                store.commit(new_dir, index, manifest)
+                if self.mmap_index:
+                    # Swap the freshly built in-memory index for the mapped file
+                    index = store.load_index(new_dir) or index
+            except OSError as e:
+                print(f"{YELLOW}  Could not persist FAISS index: {e}{RESET_COLOR}")
+            return self._open_state(new_dir, manifest, index, lexical_index)
+
+    def _open_state(self, version_dir, manifest, index, lexical_index=None):
+        set_search_params(index, self.nprobe, self.ef_search)
+        documents = ChunkStore(version_dir)
+        return RAGState(
+            next(self._versions),
+            documents,
+            self.index_store.load_embeddings(
+                version_dir, manifest["count"], manifest["dim"]
+            ),
+            index if manifest["count"] else None,
+            (
+                lexical_index
+                if lexical_index is not None
+                else self._open_lexical_index(version_dir, documents)
+            ),
+            manifest["sources"],
+        )
 
-    def retrieve_context(self, query_text, top_k=2):
+    def _encode_documents(self, texts):
+        return self.embedding_model.encode(
+            texts,
+            batch_size=RAG_EMBED_BATCH_SIZE,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+        ).astype(np.float32)
+
+    def retrieve(self, query_text, top_k=RAG_TOP_K, min_score=RAG_MIN_SIMILARITY):
+        """Return scored hits for a query, best first.
+
+        Dense hits are scored by cosine similarity and dropped below ``min_score``.
+        Keyword fallback hits come from the BM25 index and carry BM25 scores.
+        Hybrid hits carry their reciprocal-rank fusion score.
+        """
         if not query_text:
-            return ""
-        if self.index and self.embedding_model and self.documents:
+            return []
+        state = self.state
+        key = (
+            state.version,
+            normalize_query(query_text),
+            top_k,
+            min_score,
+            self.retrieval_mode,
+        )
+        hits = self.result_cache.get(key)
+        if hits is None:
+            hits = self._search(state, query_text, top_k, min_score)
+            self.result_cache.set(key, hits)
+        return list(hits)
+
+    def _search(self, state, query_text, top_k, min_score):
+        if (
+            self.retrieval_mode != "lexical"
+            and state.index
+            and self.embedding_model
+            and state.documents
+        ):
             try:
-                query_embedding = self.embedding_model.encode([query_text])
-                _, indices = self.index.search(query_embedding, top_k)
-                retrieved_docs = [
-                    self.documents[i] for i in indices[0] if i < len(self.documents)
-                ]
-                if retrieved_docs:
-                    return "\n".join(retrieved_docs)
+                if self.retrieval_mode == "hybrid":
+                    return self._hybrid_search(state, query_text, top_k, min_score)
+                return self._dense_search(state, query_text, top_k, min_score)
             except Exception as e:
                 print(
                     f"{YELLOW}  Error during FAISS retrieval: {e}. Falling back.{RESET_COLOR}"
                 )
+        return self._keyword_search(state, query_text, top_k)
 
-        relevant_docs = []
-        query_words = set(query_text.lower().split())
-        docs_to_search = (
-            self.documents
-            if self.documents
-            else list(self.knowledge_base_fallback.values())
-        )
-        for doc in docs_to_search:
-            if query_words.intersection(set(doc.lower().split())):
-                relevant_docs.append(doc)
-        if not relevant_docs:
+    def retrieve_context(self, query_text, top_k=RAG_TOP_K):
+        if not query_text:
+            return ""
+        hits = self.retrieve(query_text, top_k)
+        if not hits:
             return "No specific context found in local knowledge."
-        return "\n".join(list(set(relevant_docs))[:top_k])
+        return "\n".join(hit.text for hit in hits)
+
+    def _encode_query(self, query_text):
+        key = normalize_query(query_text)
+        embedding = self.embedding_cache.get(key)
+        if embedding is None:
+            if self.query_batcher:
+                embedding = self.query_batcher.encode(query_text)
+            else:
+                embedding = self._encode_queries([query_text])
+            self.embedding_cache.set(key, embedding)
+        return embedding
+
+    def _encode_queries(self, texts):
+        return self.embedding_model.encode(
+            texts,
+            batch_size=len(texts),
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+        ).astype(np.float32)
+
+    def _dense_search(self, state, query_text, top_k, min_score):
+        query_embedding = self._encode_query(query_text)
+        scores, indices = state.index.search(query_embedding, top_k)
+        return [
+            RetrievalHit(int(i), state.documents[i], float(score))
+            for score, i in zip(scores[0], indices[0])
+            if 0 <= i < len(state.documents) and score >= min_score
+        ]
+
+    def _hybrid_search(self, state, query_text, top_k, min_score):
+        """Fuse BM25 and dense rankings, skipping the encoder on a strong lexical hit."""
+        candidates = max(4 * top_k, 10)
+        reference = (
+            state.lexical_index.reference_score(query_text, skip_common=True) or 1.0
+        )
+        lexical = [
+            (i, score / reference)
+            for i, score in state.lexical_index.search(
+                query_text, candidates, skip_common=True
+            )
+            if score / reference >= RAG_MIN_LEXICAL_SCORE
+        ]
+        if lexical and lexical[0][1] >= RAG_LEXICAL_SHORTCUT_SCORE:
+            if len(lexical) == 1 or (
+                lexical[0][1] >= RAG_LEXICAL_SHORTCUT_MARGIN * lexical[1][1]
+            ):
+                return [
+                    RetrievalHit(i, state.documents[i], score)
+                    for i, score in lexical[:top_k]
+                ]
+
+        dense = self._dense_search(state, query_text, candidates, min_score)
+        fused = {}
+        for rank, doc_id in enumerate(i for i, _ in lexical):
+            fused[doc_id] = fused.get(doc_id, 0.0) + 1 / (RAG_RRF_K + rank + 1)
+        for rank, doc_id in enumerate(hit.doc_id for hit in dense):
+            fused[doc_id] = fused.get(doc_id, 0.0) + 1 / (RAG_RRF_K + rank + 1)
+        ranked = sorted(fused.items(), key=lambda item: (-item[1], item[0]))
+        return [
+            RetrievalHit(i, state.documents[i], score) for i, score in ranked[:top_k]
+        ]
+
+    @staticmethod
+    def _open_lexical_index(version_dir, documents):
+        try:
+            return BM25Index.load(version_dir)
+        except OSError:
+            pass
+        # Versions written before the BM25 postings were persisted
+        lexical_index = BM25Index.build(documents)
+        try:
+            lexical_index.save(version_dir)
+        except OSError as e:
+            print(f"{YELLOW}  Could not persist BM25 index: {e}{RESET_COLOR}")
+        return lexical_index
+
+    def _keyword_search(self, state, query_text, top_k):
+        return [
+            RetrievalHit(i, state.documents[i], score)
+            for i, score in state.lexical_index.search(query_text, top_k)
+        ]
 
 
 class OllamaLLM:
@@ -432,24 +1245,84 @@ class OllamaLLM:
                 f"{YELLOW}  Ensure Ollama server is running at {host} and the model is pulled.{RESET_COLOR}"
             )
 
+    def generate(self, prompt_text):
+        """Return the generated text, raising on failure instead of returning a message."""
+        if not self.client or not self.model_name:
+            raise RuntimeError("LLM not available. Please check Ollama setup.")
+        response = self.client.generate(
+            model=self.model_name,
+            prompt=prompt_text,
+            stream=False,
+            options={"temperature": OLLAMA_TEMPERATURE},
+        )
+        return response["response"]
+
     def generate_response(self, prompt_text):
         if not self.client or not self.model_name:
             return "LLM not available. Please check Ollama setup."
         try:
-            response = self.client.generate(
-                model=self.model_name,
-                prompt=prompt_text,
-                stream=False,
-                options={"temperature": 0.75},
-            )
-            generated_text = response["response"]
-            return generated_text
+            return self.generate(prompt_text)
         except Exception as e:
             print(
                 f"{YELLOW}[LLM Engine] Error during Ollama generation: {e}{RESET_COLOR}"
             )
             return f"Sorry, I encountered an error with the LLM: {e}"
 
+    def generate_stream(self, prompt_text):
+        """Yield response tokens as Ollama produces them."""
+        if not self.client or not self.model_name:
+            yield "LLM not available. Please check Ollama setup."
+            return
+        try:
+            for chunk in self.client.generate(
+                model=self.model_name,
+                prompt=prompt_text,
+                stream=True,
+                options={"temperature": OLLAMA_TEMPERATURE},
+            ):
+                token = chunk["response"]
+                if token:
+                    yield token
+        except Exception as e:
+            print(
+                f"{YELLOW}[LLM Engine] Error during Ollama streaming generation: {e}{RESET_COLOR}"
+            )
+            yield f"Sorry, I encountered an error with the LLM: {e}"
+
+
+class SentenceSplitter:
+    """Incrementally splits streamed text into sentences for TTS."""
+
+    def __init__(self, min_chars=TTS_MIN_SENTENCE_CHARS):
+        self.min_chars = min_chars
+        self._buffer = ""
+
+    def feed(self, text):
+        """Add text and return any sentences that are now complete."""
+        self._buffer += text
+        sentences = []
+        start = 0
+        for match in SENTENCE_BOUNDARY_RE.finditer(self._buffer):
+            candidate = self._buffer[start : match.end()].strip()
+            if len(candidate) >= self.min_chars:
+                sentences.append(candidate)
+                start = match.end()
+        self._buffer = self._buffer[start:]
+        return sentences
+
+    def flush(self):
+        """Return whatever text is left once the stream has ended."""
+        remainder, self._buffer = self._buffer.strip(), ""
+        return [remainder] if remainder else []
+
+
+def split_sentences(text_chunks, min_chars=TTS_MIN_SENTENCE_CHARS):
+    """Yield complete sentences from an iterable of streamed text chunks."""
+    splitter = SentenceSplitter(min_chars)
+    for chunk in text_chunks:
+        yield from splitter.feed(chunk)
+    yield from splitter.flush()
+
 
 class OpenAITTS:
     def __init__(
@@ -458,15 +1331,36 @@ class OpenAITTS:
         voice=OPENAI_TTS_VOICE,
         output_dir=OUTPUT_DIR,
         output_filename=OPENAI_TTS_OUTPUT_FILENAME,
+        cache_dir=TTS_CACHE_DIR,
+        backend=TTS_BACKEND,
     ):
+        self.model = model
+        self.voice = voice
+        self.speech_file_path = Path(output_dir) / output_filename
+        self.cache_store = (
+            AudioStore(cache_dir, TTS_CACHE_MAX_MB * 1024 * 1024, TTS_CACHE_TTL)
+            if cache_dir
+            else None
+        )
+        self.prerendered = {}  # text -> decoded float32 audio, see prerender()
+        self.client = None
+        self.backend = None  # See tts_backends; None means mock TTS
+        if backend == "piper":
+            # Cache keys name the voice file, so switching voices never replays old audio
+            self.model, self.voice = "piper", Path(TTS_PIPER_MODEL).stem
+            try:
+                self.backend = PiperBackend(TTS_PIPER_MODEL, workers=TTS_LOCAL_WORKERS)
+            except (ImportError, FileNotFoundError) as e:
+                print(f"{YELLOW}[TTS Engine] {e}. TTS will not function.{RESET_COLOR}")
+            return
         if not OpenAI:
             print(
                 f"{YELLOW}OpenAI library not available. TTS will not function.{RESET_COLOR}"
             )
-            self.client = None
             return
         try:
             self.client = OpenAI()
+            self.backend = OpenAIBackend(self.client, self.model, self.voice)
             # print(f"{CYAN}[TTS Engine] OpenAI TTS client initialized.{RESET_COLOR}") # Less verbose
         except Exception as e:
             print(
@@ -474,86 +1368,235 @@ class OpenAITTS:
             )
             self.client = None
 
-        self.model = model
-        self.voice = voice
-        self.speech_file_path = Path(output_dir) / output_filename
+    @property
+    def file_format(self):
+        # Format for saved audio files; local voices produce PCM, so WAV costs no encode
+        return "mp3" if self.backend and "mp3" in self.backend.formats else "wav"
+
+    def close(self):
+        if self.backend:
+            self.backend.close()
+
+    def cache_key(self, text, response_format):
+        """Content address of the audio for ``text`` in this voice and format."""
+        material = json.dumps([self.model, self.voice, response_format, text.strip()])
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def cached_path(self, text, response_format):
+        if self.cache_store is None:
+            return None
+        return self.cache_store.path_for(
+            self.cache_key(text, response_format), f".{response_format}"
+        )
+
+    @staticmethod
+    def temp_path(path):
+        # Written first and renamed into place, so readers never see a partial file
+        return path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}")
+
+    @classmethod
+    def write_atomic(cls, path, data):
+        tmp_path = cls.temp_path(path)
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+
+    def stream_speech(self, text_to_speak, response_format="mp3", cache_path=None):
+        """Yield encoded audio chunks for ``text_to_speak`` as the backend produces them.
+
+        With ``cache_path`` the chunks are also written to that file, which
+        appears only once the whole stream has been received; a stream that is
+        abandoned or fails midway leaves nothing behind.
+        """
+        tmp_path = self.temp_path(cache_path) if cache_path else None
+        out = None
+        try:
+            out = open(tmp_path, "wb") if tmp_path else None
+            for chunk in self.backend.stream(
+                text_to_speak, response_format, TTS_STREAM_CHUNK_BYTES
+            ):
+                if out:
+                    out.write(chunk)
+                yield chunk
+            if out:
+                out.close()
+                if response_format == "wav":
+                    patch_wav_sizes(tmp_path)
+                os.replace(tmp_path, cache_path)
+        finally:
+            if out and not out.closed:
+                out.close()
+            if tmp_path and tmp_path.exists():
+                tmp_path.unlink()
+
+    def prerender(self, phrases=TTS_CANNED_PHRASES, max_parallel=TTS_PIPELINE_WORKERS):
+        """Synthesize ``phrases`` now and keep them decoded for instant playback."""
+        if not self.backend:
+            return
+        self.backend.warmup()
+        phrases = [p for p in phrases if p not in self.prerendered]
+        with ThreadPoolExecutor(max_workers=max_parallel) as pool:
+            for phrase, audio in zip(phrases, pool.map(self.synthesize_pcm, phrases)):
+                if audio is not None:
+                    self.prerendered[phrase] = audio
+        print(
+            f"{CYAN}[TTS Engine] {len(self.prerendered)} canned phrases ready.{RESET_COLOR}"
+        )
 
     def synthesize_speech(self, text_to_speak):
-        if not self.client:
+        if not self.backend:
             print(f"{PINK}🔊 Agent (mock TTS): {text_to_speak}{RESET_COLOR}")
             return
-        if not sd or not sf:
+        if not sd:
             print(f"{PINK}🔊 Agent (mock TTS): {text_to_speak}{RESET_COLOR}")
             return
         if not text_to_speak or not text_to_speak.strip():
             print(f"{YELLOW}[TTS Engine] No valid text to speak.{RESET_COLOR}")
             return
         try:
-            with self.client.audio.speech.with_streaming_response.create(
-                model=self.model,
-                voice=self.voice,
-                input=text_to_speak,
-                response_format="mp3",
-            ) as response:
-                response.stream_to_file(self.speech_file_path)
-
-            if os.path.exists(self.speech_file_path):
-                data, samplerate = sf.read(self.speech_file_path, dtype="float32")
-                sd.play(data, samplerate)
-                sd.wait()
-            else:
-                print(
-                    f"{YELLOW}[TTS Engine] Speech file not found after synthesis: {self.speech_file_path}{RESET_COLOR}"
-                )
+            # Raw PCM plays without an mp3 file round trip or decode
+            audio = self.synthesize_pcm(text_to_speak)
+            if audio is None:
+                raise RuntimeError("no audio returned")
+            sd.play(audio, OPENAI_TTS_PCM_SAMPLE_RATE)
+            sd.wait()
 
         except Exception as e:
             print(
-                f"{YELLOW}[TTS Engine] Error during OpenAI TTS synthesis or playback: {e}{RESET_COLOR}"
+                f"{YELLOW}[TTS Engine] Error during TTS synthesis or playback: {e}{RESET_COLOR}"
             )
             import traceback
 
             traceback.print_exc()
             print(f"{PINK}🔊 Agent (mock TTS on error): {text_to_speak}{RESET_COLOR}")
 
+    def synthesize_pcm_bytes(self, text_to_speak):
+        """Synthesize text to raw 16-bit mono PCM at OPENAI_TTS_PCM_SAMPLE_RATE."""
+        if not self.backend or not text_to_speak or not text_to_speak.strip():
+            return None
+        cached_path = self.cached_path(text_to_speak, "pcm")
+        if cached_path and self.cache_store.touch(cached_path):
+            try:
+                return cached_path.read_bytes()
+            except FileNotFoundError:
+                pass  # Evicted between the touch and the read
+        try:
+            pcm = self.backend.synthesize_pcm(text_to_speak)
+        except Exception as e:
+            print(f"{YELLOW}[TTS Engine] Error during TTS synthesis: {e}{RESET_COLOR}")
+            return None
+        if cached_path:
+            try:
+                self.write_atomic(cached_path, pcm)
+            except OSError as e:
+                print(f"{YELLOW}[TTS Engine] Could not cache audio: {e}{RESET_COLOR}")
+        return pcm
+
+    def synthesize_pcm(self, text_to_speak):
+        """Synthesize text to a float32 NumPy array at OPENAI_TTS_PCM_SAMPLE_RATE."""
+        if text_to_speak in self.prerendered:
+            return self.prerendered[text_to_speak]
+        pcm = self.synthesize_pcm_bytes(text_to_speak)
+        if pcm is None:
+            return None
+        return np.frombuffer(pcm, dtype=np.int16).astype(np.float32) / 32768.0
+
+    def speak_stream(self, text_chunks, max_parallel=TTS_PIPELINE_WORKERS):
+        """Speak streamed text sentence by sentence while it is still arriving.
+
+        Sentences are synthesized in parallel and played in order on a single
+        output stream, so playback is gapless. Returns the full spoken text.
+        """
+        if not self.backend or not sd:
+            text = "".join(text_chunks)
+            print(f"{PINK}🔊 Agent (mock TTS): {text}{RESET_COLOR}")
+            return text
+
+        spoken = []
+        pending = queue.Queue()
+
+        def play():
+            with sd.OutputStream(
+                samplerate=OPENAI_TTS_PCM_SAMPLE_RATE, channels=1, dtype="float32"
+            ) as stream:
+                while True:
+                    future = pending.get()
+                    if future is None:
+                        break
+                    audio = future.result()
+                    if audio is not None and audio.size:
+                        stream.write(audio)
+
+        player = threading.Thread(target=play, daemon=True)
+        player.start()
+        try:
+            with ThreadPoolExecutor(max_workers=max_parallel) as pool:
+                for sentence in split_sentences(text_chunks):
+                    print(f"{NEON_GREEN}[Orbit]: {sentence}{RESET_COLOR}")
+                    spoken.append(sentence)
+                    pending.put(pool.submit(self.synthesize_pcm, sentence))
+        finally:
+            pending.put(None)
+            player.join()
+        return " ".join(spoken)
+
 
 class PythonHubAgent:
-    def __init__(self):
+    def __init__(self, pipelined_tts=True, streaming_stt=True):
         print(f"{PINK}🚀 Initializing Python Hub Agent...{RESET_COLOR}")
+        self.pipelined_tts = pipelined_tts
+        self.streaming_stt = streaming_stt and whisper is not None
         self.microphone = Microphone()
         self.stt_engine = WhisperSTT()
         self.rag_system = LocalRAG()
         self.llm_engine = OllamaLLM()
         self.tts_engine = OpenAITTS()
+        if self.tts_engine.cache_store:
+            self.tts_engine.cache_store.sweep()
+        self.tts_engine.prerender()
 
         print(f"{PINK}✅ Python Hub Agent initialized.{RESET_COLOR}")
         print("---")
         print(
             f"{YELLOW}IMPORTANT: Ensure Ollama server is running (`ollama serve`) and model '{OLLAMA_MODEL_NAME}' is pulled.{RESET_COLOR}"
         )
-        print(
-            f"{YELLOW}IMPORTANT: Ensure OPENAI_API_KEY environment variable is set for OpenAI TTS.{RESET_COLOR}"
-        )
+        if TTS_BACKEND == "openai":
+            print(
+                f"{YELLOW}IMPORTANT: Ensure OPENAI_API_KEY environment variable is set for OpenAI TTS.{RESET_COLOR}"
+            )
         print(
             f"{YELLOW}Knowledge for RAG is expected in '{RAG_KNOWLEDGE_FILE}'.{RESET_COLOR}"
         )
-        print(
-            f"{YELLOW}OpenAI TTS using model '{OPENAI_TTS_MODEL}' and voice '{OPENAI_TTS_VOICE}'.{RESET_COLOR}"
-        )
+        if TTS_BACKEND == "openai":
+            print(
+                f"{YELLOW}OpenAI TTS using model '{OPENAI_TTS_MODEL}' and voice '{OPENAI_TTS_VOICE}'.{RESET_COLOR}"
+            )
+        else:
+            print(
+                f"{YELLOW}Local TTS using Piper voice '{TTS_PIPER_MODEL}' in {TTS_LOCAL_WORKERS} worker processes.{RESET_COLOR}"
+            )
         print("---")
 
     def process_single_turn(self):
-        raw_input_data = self.microphone.listen()
+        transcriber = None
+        if self.streaming_stt:
+            transcriber = StreamingTranscriber(self.stt_engine)
+        raw_input_data = self.microphone.listen(
+            on_audio=transcriber.feed if transcriber else None
+        )
         if raw_input_data is None:
-            self.tts_engine.synthesize_speech(
-                "I didn't catch that. Could you please say it again?"
-            )
+            if transcriber:
+                transcriber.cancel()
+            self.tts_engine.synthesize_speech(TTS_NOT_HEARD)
             return True
 
-        user_query_text = self.stt_engine.transcribe(raw_input_data)
+        if transcriber and not isinstance(raw_input_data, str):
+            user_query_text = transcriber.finish()
+        else:
+            if transcriber:
+                transcriber.cancel()
+            user_query_text = self.stt_engine.transcribe(raw_input_data)
         if user_query_text is None or not user_query_text.strip():
-            self.tts_engine.synthesize_speech(
-                "Sorry, I had trouble understanding what you said. Please try again."
-            )
+            self.tts_engine.synthesize_speech(TTS_NOT_UNDERSTOOD)
             return True
 
         print(f"{NEON_GREEN}[User Query]: '{user_query_text}'{RESET_COLOR}")
@@ -565,7 +1608,7 @@ class PythonHubAgent:
             "stop",
             "thank you goodbye",
         ]:
-            self.tts_engine.synthesize_speech("Goodbye! Have a great day.")
+            self.tts_engine.synthesize_speech(TTS_GOODBYE)
             return False
 
         retrieved_context = self.rag_system.retrieve_context(user_query_text)
@@ -579,6 +1622,9 @@ Relevant Information from Knowledge Base:
 Based on the user query and relevant information, provide a concise, positive, and encouraging answer. If the information is insufficient, say so cheerfully and offer general help. Do not make up facts.
 Orbit (in a playful and cheering voice):"""
 
+        if self.pipelined_tts:
+            return self._respond_pipelined(prompt)
+
         llm_response_text = self.llm_engine.generate_response(prompt)
 
         if (
@@ -589,18 +1635,31 @@ Orbit (in a playful and cheering voice):"""
             print(
                 f"{YELLOW}[Python Hub] LLM response issue: {llm_response_text}{RESET_COLOR}"
             )
-            self.tts_engine.synthesize_speech(
-                "I'm having a little trouble thinking right now. Please try again in a moment."
-            )
+            self.tts_engine.synthesize_speech(TTS_LLM_TROUBLE)
         else:
             print(f"{NEON_GREEN}[Orbit]: {llm_response_text.strip()}{RESET_COLOR}")
             self.tts_engine.synthesize_speech(llm_response_text)
         return True
 
+    def _respond_pipelined(self, prompt):
+        """Stream the LLM answer into TTS so speech starts after the first sentence."""
+        tokens = self.llm_engine.generate_stream(prompt)
+        first_token = next(tokens, "")
+        if (
+            not first_token
+            or first_token.startswith("LLM not available")
+            or first_token.startswith("Sorry, I encountered an error")
+        ):
+            print(
+                f"{YELLOW}[Python Hub] LLM response issue: {first_token}{RESET_COLOR}"
+            )
+            self.tts_engine.synthesize_speech(TTS_LLM_TROUBLE)
+            return True
+        self.tts_engine.speak_stream(itertools.chain([first_token], tokens))
+        return True
+
     def start_conversation(self):
-        self.tts_engine.synthesize_speech(
-            f"Hello there! I'm Orbit, your super friendly local assistant! How can I make your day awesome?"
-        )
+        self.tts_engine.synthesize_speech(TTS_GREETING)
         conversation_active = True
         while conversation_active:
             try:
@@ -610,9 +1669,7 @@ Orbit (in a playful and cheering voice):"""
                     f"\n{YELLOW}Conversation interrupted by user (Ctrl+C).{RESET_COLOR}"
                 )
                 if self.tts_engine:
-                    self.tts_engine.synthesize_speech(
-                        "Okay, exiting now! Have a fantastic day!"
-                    )
+                    self.tts_engine.synthesize_speech(TTS_EXITING)
                 conversation_active = False
             except Exception as e:
                 print(
@@ -622,9 +1679,7 @@ Orbit (in a playful and cheering voice):"""
 
                 traceback.print_exc()
                 if self.tts_engine:
-                    self.tts_engine.synthesize_speech(
-                        "Whoops! I hit a little snag. Let's try that again, or you can say quit to exit."
-                    )
+                    self.tts_engine.synthesize_speech(TTS_SNAG)
                 conversation_active = True
 
         print(f"{PINK}Conversation ended.{RESET_COLOR}")
@@ -634,9 +1689,23 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(
         description="Local Speech-to-Speech AI Agent with OpenAI TTS"
     )
+    parser.add_argument(
+        "--serial-tts",
+        action="store_true",
+        help="Wait for the full LLM answer before synthesizing speech",
+    )
+    parser.add_argument(
+        "--batch-stt",
+        action="store_true",
+        help="Transcribe only after recording ends instead of while the user speaks",
+    )
     args = parser.parse_args()
 
-    if not all([whisper, OpenAI, ollama_client, sd, sf, SentenceTransformer, faiss]):
+    # The OpenAI client is only needed for OpenAI TTS
+    tts_library = OpenAI if TTS_BACKEND == "openai" else True
+    if not all(
+        [whisper, tts_library, ollama_client, sd, sf, SentenceTransformer, faiss]
+    ):
         print(
             f"\n{YELLOW}One or more critical libraries are missing. Please install them (see messages above) and try again.{RESET_COLOR}"
         )
@@ -657,5 +1726,10 @@ if __name__ == "__main__":
                 f.write("OpenAI TTS provides natural-sounding text-to-speech voices.\n")
                 f.write("The best way to learn is by doing and having fun!\n")
 
-        agent = PythonHubAgent()
-        agent.start_conversation()
+        agent = PythonHubAgent(
+            pipelined_tts=not args.serial_tts, streaming_stt=not args.batch_stt
+        )
+        try:
+            agent.start_conversation()
+        finally:
+            agent.tts_engine.close()
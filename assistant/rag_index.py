@@ -0,0 +1,676 @@
+import os
+import re
+import json
+import math
+import time
+import queue
+import shutil
+import hashlib
+import threading
+import contextlib
+from concurrent.futures import Future
+from pathlib import Path
+
+import numpy as np
+
+try:
+    import faiss
+except ImportError:
+    faiss = None
+
+try:
+    import fcntl
+except ImportError:  # Windows: builds are not coordinated across processes
+    fcntl = None
+
+
+def content_hash(text):
+    """Stable hash of a document's text, used to detect added or changed entries."""
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class IndexStore:
+    """Versioned on-disk RAG index: chunk store, embeddings and FAISS index.
+
+    Each build is written into its own version directory. ``CURRENT`` names the
+    live version and is swapped with ``os.replace``, so readers in other
+    processes never see a half-written index. A version is only reused when its
+    ``config`` (embedding model settings) matches, so switching models never
+    mixes incompatible vectors.
+    """
+
+    CURRENT_FILE = "CURRENT"
+    LOCK_FILE = "build.lock"
+    MANIFEST_FILE = "manifest.json"
+    EMBEDDINGS_FILE = "embeddings.f32"
+    INDEX_FILE = "index.faiss"
+
+    def __init__(self, index_dir, config=None):
+        self.index_dir = Path(index_dir)
+        self.config = config
+
+    def current_version(self):
+        try:
+            name = (self.index_dir / self.CURRENT_FILE).read_text().strip()
+        except OSError:
+            return None
+        version_dir = self.index_dir / name
+        return version_dir if name and version_dir.is_dir() else None
+
+    def load_manifest(self, version_dir):
+        """Return the version's manifest, or ``None`` if missing or built differently.
+
+        A store opened with ``config=None`` accepts any version's manifest.
+        """
+        if version_dir is None:
+            return None
+        try:
+            with open(version_dir / self.MANIFEST_FILE, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if self.config is not None and manifest.get("config") != self.config:
+            return None
+        return manifest
+
+    def load_embeddings(self, version_dir, count, dim):
+        """Memory-map a version's ``(count, dim)`` float32 embedding matrix."""
+        if not count:
+            return np.empty((0, dim), dtype=np.float32)
+        return np.memmap(
+            version_dir / self.EMBEDDINGS_FILE,
+            dtype=np.float32,
+            mode="r",
+            shape=(count, dim),
+        )
+
+    def load_index(self, version_dir, mmap=True):
+        """Read a version's FAISS index, memory-mapped where the index type allows it.
+
+        A mapped index lives in the page cache rather than process memory, so
+        every worker process that opens the same version shares one copy.
+        """
+        index_path = version_dir / self.INDEX_FILE
+        if not faiss or not index_path.exists():
+            return None
+        if mmap:
+            # IO_FLAG_MMAP_IFC maps the vectors in place; older FAISS releases
+            # only have IO_FLAG_MMAP, which maps inverted lists but copies the rest
+            flag = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP)
+            try:
+                return faiss.read_index(str(index_path), flag)
+            except RuntimeError:
+                pass
+        return faiss.read_index(str(index_path))
+
+    @contextlib.contextmanager
+    def build_lock(self):
+        """Exclusive lock across processes for checking and building a version.
+
+        Worker processes that notice the same knowledge base change queue up
+        here; the first one builds, the others then find its version current.
+        """
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        with open(self.index_dir / self.LOCK_FILE, "a") as f:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def new_version(self):
+        version_dir = self.index_dir / f"v{time.time_ns()}-{os.getpid()}"
+        version_dir.mkdir(parents=True)
+        return version_dir
+
+    def commit(self, version_dir, index, manifest):
+        """Write the index and manifest into ``version_dir`` and make it current."""
+        faiss.write_index(index, str(version_dir / self.INDEX_FILE))
+        with open(version_dir / self.MANIFEST_FILE, "w", encoding="utf-8") as f:
+            json.dump(dict(manifest, config=self.config), f)
+
+        previous = self.current_version()
+        pointer_tmp = self.index_dir / f"{self.CURRENT_FILE}.tmp{os.getpid()}"
+        pointer_tmp.write_text(version_dir.name)
+        os.replace(pointer_tmp, self.index_dir / self.CURRENT_FILE)
+        self._prune(keep={version_dir.name, previous.name if previous else None})
+
+    def _prune(self, keep):
+        # The previous version is kept for readers that resolved CURRENT just before
+        # the swap; anything older is unreachable. Open memory maps survive unlinking.
+        # Uncommitted versions are skipped for a while: another process may be building.
+        for entry in self.index_dir.iterdir():
+            if (
+                not entry.is_dir()
+                or not entry.name.startswith("v")
+                or entry.name in keep
+            ):
+                continue
+            committed = (entry / self.MANIFEST_FILE).exists()
+            if committed or time.time() - entry.stat().st_mtime > 3600:
+                shutil.rmtree(entry, ignore_errors=True)
+
+
+TOKEN_RE = re.compile(r"\w+")
+
+
+def normalize_query(text):
+    """Canonical form of a query for cache keys: case, spacing and end punctuation."""
+    return " ".join(text.lower().split()).rstrip(" ?!.")
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower())
+
+
+def term_hash(term):
+    """64-bit key of a vocabulary term in a persisted ``BM25Index``."""
+    return int.from_bytes(
+        hashlib.blake2b(term.encode("utf-8"), digest_size=8).digest(), "little"
+    )
+
+
+def _or_empty(array, dtype, fill=()):
+    return np.array(fill, dtype=dtype) if array is None else array
+
+
+class BM25Index:
+    """Inverted index with Okapi BM25 ranking for lexical retrieval.
+
+    Postings are stored as flat arrays (CSR layout): the postings of the term
+    at row ``r`` of ``term_hashes`` (sorted 64-bit term keys) are
+    ``doc_ids[offsets[r]:offsets[r + 1]]`` with matching ``tfs``. ``save``
+    writes them into an index version directory and ``load`` memory-maps
+    them, so every worker process shares one copy in the page cache and a
+    restart does not re-tokenize the corpus.
+
+    With ``skip_common=True`` query terms found in more than ``max_df_ratio``
+    of the documents are ignored, unless that would leave none: their IDF is
+    close to zero, so they barely change the ranking, but their posting lists
+    are the longest to scan. Hybrid retrieval uses this for its quick lexical
+    check; plain keyword search scores every term.
+    """
+
+    TERMS_FILE = "bm25_terms.u64"
+    OFFSETS_FILE = "bm25_offsets.i64"
+    DOC_IDS_FILE = "bm25_docs.i32"
+    TFS_FILE = "bm25_tfs.u16"
+    LENGTHS_FILE = "bm25_lengths.i32"
+    FILES = (
+        (TERMS_FILE, "<u8"),
+        (OFFSETS_FILE, "<i8"),
+        (DOC_IDS_FILE, "<i4"),
+        (TFS_FILE, "<u2"),
+        (LENGTHS_FILE, "<i4"),
+    )
+
+    def __init__(
+        self,
+        term_hashes=None,
+        offsets=None,
+        doc_ids=None,
+        tfs=None,
+        doc_lengths=None,
+        k1=1.5,
+        b=0.75,
+        max_df_ratio=0.5,
+    ):
+        self.k1 = k1
+        self.b = b
+        self.max_df_ratio = max_df_ratio
+        self.term_hashes = _or_empty(term_hashes, "<u8")
+        self.offsets = _or_empty(offsets, "<i8", fill=[0])
+        self.doc_ids = _or_empty(doc_ids, "<i4")
+        self.tfs = _or_empty(tfs, "<u2")
+        self.doc_lengths = _or_empty(doc_lengths, "<i4")  # Token count per doc id
+        # Empty documents are not part of the collection statistics
+        self.num_docs = int(np.count_nonzero(self.doc_lengths))
+        self.avg_length = (
+            float(self.doc_lengths.sum()) / self.num_docs if self.num_docs else 0.0
+        )
+
+    def __len__(self):
+        return self.num_docs
+
+    @classmethod
+    def build(cls, documents, cached_chunks=None, cached_index=None, **params):
+        """Index an iterable of texts; document ids are their positions.
+
+        When ``documents`` is a ChunkStore, chunks whose hash appears in
+        ``cached_chunks`` copy their postings from ``cached_index`` (the index
+        built over those chunks); only new or changed chunks are tokenized.
+        """
+        reused_rows = None
+        if cached_index is not None and cached_chunks is not None:
+            reused_rows = np.full(len(documents), -1)
+            if len(cached_chunks) and len(documents):
+                cached_keys, cached_rows = cached_chunks.sorted_hashes()
+                keys = np.ascontiguousarray(documents.records["hash"]).view("S16")
+                keys = keys.ravel()
+                pos = np.searchsorted(cached_keys, keys).clip(0, len(cached_keys) - 1)
+                found = cached_keys[pos] == keys
+                reused_rows[found] = cached_rows[pos[found]]
+            texts = ((i, documents[i]) for i in np.flatnonzero(reused_rows < 0))
+        else:
+            texts = enumerate(documents)
+
+        vocabulary = {}
+        term_ids, doc_ids, lengths = [], [], []
+        for doc_id, text in texts:
+            tokens = tokenize(text) if text else []
+            term_ids.extend(vocabulary.setdefault(t, len(vocabulary)) for t in tokens)
+            doc_ids.append(doc_id)
+            lengths.append(len(tokens))
+        hashes = np.fromiter(
+            (term_hash(term) for term in vocabulary), dtype="<u8", count=len(vocabulary)
+        )
+        postings = [
+            (
+                hashes[np.array(term_ids, dtype=np.int64)],
+                np.repeat(np.array(doc_ids, dtype=np.int64), lengths),
+                np.ones(len(term_ids), dtype=np.int64),
+            )
+        ]
+        doc_lengths = np.zeros(
+            len(doc_ids) if reused_rows is None else len(reused_rows), dtype="<i4"
+        )
+        doc_lengths[doc_ids] = lengths
+        if reused_rows is not None:
+            reused = np.flatnonzero(reused_rows >= 0)
+            doc_lengths[reused] = cached_index.doc_lengths[reused_rows[reused]]
+            terms, positions, tfs = cached_index._doc_postings(reused_rows[reused])
+            postings.append((terms, reused[positions], tfs))
+        return cls._from_postings(
+            *map(np.concatenate, zip(*postings)), doc_lengths, **params
+        )
+
+    @classmethod
+    def _from_postings(cls, hashes, doc_ids, tfs, doc_lengths, **params):
+        """Assemble the CSR arrays from unordered ``(term hash, doc id, tf)`` rows."""
+        term_hashes, term_rows = np.unique(hashes, return_inverse=True)
+        num_docs = max(1, len(doc_lengths))
+        # One (term, doc) pair per posting, counted, in sorted-term-hash order
+        pairs, inverse = np.unique(
+            term_rows.reshape(-1) * num_docs + doc_ids, return_inverse=True
+        )
+        counts = np.bincount(inverse.reshape(-1), weights=tfs, minlength=len(pairs))
+        term_rows, doc_ids = np.divmod(pairs, num_docs)
+        offsets = np.zeros(len(term_hashes) + 1, dtype="<i8")
+        np.cumsum(np.bincount(term_rows, minlength=len(term_hashes)), out=offsets[1:])
+        return cls(
+            term_hashes.astype("<u8"),
+            offsets,
+            doc_ids.astype("<i4"),
+            np.minimum(counts, np.iinfo(np.uint16).max).astype("<u2"),
+            doc_lengths,
+            **params,
+        )
+
+    def _doc_postings(self, rows):
+        """``(term hashes, positions, tfs)`` of the documents ``rows``.
+
+        ``positions`` index into ``rows``, so postings can be renumbered.
+        """
+        by_doc = np.argsort(self.doc_ids, kind="stable")
+        starts = np.zeros(len(self.doc_lengths) + 1, dtype=np.int64)
+        np.cumsum(
+            np.bincount(self.doc_ids, minlength=len(self.doc_lengths)), out=starts[1:]
+        )
+        counts = starts[rows + 1] - starts[rows]
+        positions = np.repeat(np.arange(len(rows)), counts)
+        within = np.arange(int(counts.sum())) - np.repeat(
+            np.cumsum(counts) - counts, counts
+        )
+        selected = by_doc[starts[rows][positions] + within]
+        term_rows = np.searchsorted(self.offsets, selected, side="right") - 1
+        return self.term_hashes[term_rows], positions, self.tfs[selected]
+
+    def save(self, directory):
+        directory = Path(directory)
+        arrays = (
+            self.term_hashes,
+            self.offsets,
+            self.doc_ids,
+            self.tfs,
+            self.doc_lengths,
+        )
+        for (name, dtype), array in zip(self.FILES, arrays):
+            tmp = directory / f".{name}.{os.getpid()}"
+            np.ascontiguousarray(array, dtype=dtype).tofile(tmp)
+            os.replace(tmp, directory / name)
+
+    @classmethod
+    def load(cls, directory, **params):
+        """Memory-map a saved index; raises ``OSError`` if it was never saved."""
+        directory = Path(directory)
+        arrays = []
+        for name, dtype in cls.FILES:
+            path = directory / name
+            arrays.append(
+                np.memmap(path, dtype=dtype, mode="r")
+                if path.stat().st_size
+                else np.empty(0, dtype=dtype)
+            )
+        return cls(*arrays, **params)
+
+    def _postings(self, term):
+        """``(doc_ids, tfs)`` of a term, or ``None`` if it is not indexed."""
+        key = np.uint64(term_hash(term))
+        row = int(np.searchsorted(self.term_hashes, key))
+        if row >= len(self.term_hashes) or self.term_hashes[row] != key:
+            return None
+        start, end = int(self.offsets[row]), int(self.offsets[row + 1])
+        return self.doc_ids[start:end], self.tfs[start:end]
+
+    def _idf(self, df):
+        return math.log(1 + (self.num_docs - df + 0.5) / (df + 0.5))
+
+    def _query_terms(self, query_text, skip_common=False):
+        """``(term, postings)`` for each distinct query term."""
+        terms = [(term, self._postings(term)) for term in set(tokenize(query_text))]
+        if not skip_common:
+            return terms
+        max_df = max(1, self.max_df_ratio * self.num_docs)
+        rare = [
+            (term, postings)
+            for term, postings in terms
+            if postings is None or len(postings[0]) <= max_df
+        ]
+        if any(postings is not None for _, postings in rare):
+            return rare
+        return terms
+
+    def reference_score(self, query_text, skip_common=False):
+        """Score of an average-length document containing each query term once.
+
+        Dividing by this puts scores on a roughly 0-1 scale (the share of the
+        query's IDF weight a document matches), comparable across queries.
+        """
+        return sum(
+            self._idf(len(postings[0]) if postings else 0)
+            for _, postings in self._query_terms(query_text, skip_common)
+        )
+
+    def search(self, query_text, top_k=10, skip_common=False):
+        """Return ``[(doc_id, score)]`` best first; ties break on ``doc_id``."""
+        if not self.num_docs:
+            return []
+        scores = np.zeros(len(self.doc_lengths), dtype=np.float64)
+        matched = False
+        for _, postings in self._query_terms(query_text, skip_common):
+            if postings is None:
+                continue
+            doc_ids, tfs = postings
+            tfs = tfs.astype(np.float64)
+            norm = self.k1 * (
+                1 - self.b + self.b * self.doc_lengths[doc_ids] / self.avg_length
+            )
+            scores[doc_ids] += (
+                self._idf(len(doc_ids)) * tfs * (self.k1 + 1) / (tfs + norm)
+            )
+            matched = True
+        if not matched:
+            return []
+        candidates = np.flatnonzero(scores > 0)
+        if len(candidates) > top_k:
+            # Keep everything tied with the k-th best so ties still break on doc_id
+            kth = np.partition(scores[candidates], len(candidates) - top_k)[
+                len(candidates) - top_k
+            ]
+            candidates = candidates[scores[candidates] >= kth]
+        order = np.lexsort((candidates, -scores[candidates]))[:top_k]
+        return [(int(i), float(scores[i])) for i in candidates[order]]
+
+
+class EmbeddingBatcher:
+    """Coalesces concurrent single-query encodes into one batched model call.
+
+    Callers block in ``encode`` while a worker thread gathers queries arriving
+    within ``max_wait_ms`` (or until ``max_batch_size``), encodes them together
+    and hands each caller its row. A lone request is encoded immediately rather
+    than waiting out the window.
+    """
+
+    def __init__(self, encode_fn, max_batch_size=32, max_wait_ms=5):
+        self.encode_fn = encode_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.batches = 0
+        self.encoded = 0
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_worker(self):
+        # Started lazily and restarted after a fork: threads do not survive into
+        # worker processes forked from a preloaded app
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self._queue = queue.Queue()
+            self._in_flight = 0
+            self._lock = threading.Lock()
+            self._worker = threading.Thread(
+                target=self._run, name="orbit-embed-batcher", daemon=True
+            )
+            self._worker.start()
+            self._pid = os.getpid()
+
+    def encode(self, text):
+        """Return the embedding of ``text`` as a ``(1, dim)`` array."""
+        self._ensure_worker()
+        future = Future()
+        with self._lock:
+            self._in_flight += 1
+        self._queue.put((text, future))
+        try:
+            return future.result()
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except queue.Empty:
+                pass
+            # Only wait for stragglers when other requests are already in flight
+            with self._lock:
+                others_in_flight = self._in_flight > len(batch)
+            remaining = deadline - time.monotonic()
+            if not others_in_flight or remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            texts = list(dict.fromkeys(text for text, _ in batch))
+            try:
+                embeddings = self.encode_fn(texts)
+                rows = {text: i for i, text in enumerate(texts)}
+                for text, future in batch:
+                    future.set_result(embeddings[rows[text]][None, :])
+                self.batches += 1
+                self.encoded += len(texts)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "encoded": self.encoded,
+            "mean_batch_size": self.encoded / self.batches if self.batches else 0.0,
+        }
+
+
+# --- Index factory ---
+INDEX_TYPES = ("flat", "ivf_flat", "hnsw", "ivf_pq")
+# Per-dimension precision of stored vectors for flat, ivf_flat and hnsw indexes.
+# float16 halves memory and int8 (scalar-quantized, range trained per dimension)
+# quarters it; ivf_pq always stores compressed product-quantizer codes instead.
+VECTOR_STORAGE_TYPES = ("float32", "float16", "int8")
+
+
+def choose_index_type(num_vectors):
+    """Pick an index type for a corpus size when ``index_type="auto"``."""
+    if num_vectors < 20_000:
+        return "flat"  # Exact search is still sub-millisecond at this size
+    if num_vectors < 500_000:
+        return "hnsw"
+    if num_vectors < 5_000_000:
+        return "ivf_flat"
+    return "ivf_pq"  # Compressed codes keep memory bounded at this scale
+
+
+def _default_nlist(num_vectors):
+    return int(min(65536, max(1, 4 * np.sqrt(num_vectors))))
+
+
+def _default_pq_m(dim):
+    # Largest sub-quantizer count that divides dim with at least 4 dims per code
+    for m in range(max(1, dim // 4), 0, -1):
+        if dim % m == 0:
+            return m
+    return 1
+
+
+def resolve_index_config(
+    num_vectors,
+    dim,
+    index_type="auto",
+    metric="l2",
+    nlist=None,
+    hnsw_m=32,
+    pq_m=None,
+    storage="float32",
+):
+    """Turn user settings into a concrete, comparable index configuration."""
+    if index_type == "auto":
+        index_type = choose_index_type(num_vectors)
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type '{index_type}'. Options: {INDEX_TYPES}")
+    if storage not in VECTOR_STORAGE_TYPES:
+        raise ValueError(
+            f"Unknown vector storage '{storage}'. Options: {VECTOR_STORAGE_TYPES}"
+        )
+
+    flat = {"type": "flat", "metric": metric, "dim": dim}
+    if storage != "float32":
+        flat["storage"] = storage
+    config = dict(flat, type=index_type)
+    if index_type in ("ivf_flat", "ivf_pq"):
+        # IVF training wants ~39+ points per centroid; fall back to exact search
+        config["nlist"] = nlist or min(_default_nlist(num_vectors), num_vectors // 39)
+        if config["nlist"] < 4 or num_vectors < config["nlist"]:
+            return flat
+    if index_type == "ivf_pq":
+        config.pop("storage", None)
+        config["pq_m"] = pq_m or _default_pq_m(dim)
+        if num_vectors < 256 * 39:
+            return flat
+    if index_type == "hnsw":
+        config["hnsw_m"] = hnsw_m
+    return config
+
+
+def flat_index(dim, metric="l2"):
+    return faiss.IndexFlatIP(dim) if metric == "ip" else faiss.IndexFlatL2(dim)
+
+
+def build_index(
+    embeddings, config, train_sample_size=100_000, seed=1234, add_batch_size=65536
+):
+    """Build and populate a FAISS index described by ``resolve_index_config``."""
+    dim = config["dim"]
+    faiss_metric = (
+        faiss.METRIC_INNER_PRODUCT if config["metric"] == "ip" else faiss.METRIC_L2
+    )
+    index_type = config["type"]
+    qtype = {
+        "float16": faiss.ScalarQuantizer.QT_fp16,
+        "int8": faiss.ScalarQuantizer.QT_8bit,
+    }.get(config.get("storage"))
+
+    if index_type == "flat":
+        if qtype is None:
+            index = flat_index(dim, config["metric"])
+        else:
+            index = faiss.IndexScalarQuantizer(dim, qtype, faiss_metric)
+    elif index_type == "hnsw":
+        if qtype is None:
+            index = faiss.IndexHNSWFlat(dim, config["hnsw_m"], faiss_metric)
+        else:
+            index = faiss.IndexHNSWSQ(dim, qtype, config["hnsw_m"], faiss_metric)
+        index.hnsw.efConstruction = max(40, 2 * config["hnsw_m"])
+    else:
+        quantizer = flat_index(dim, config["metric"])
+        if index_type == "ivf_pq":
+            index = faiss.IndexIVFPQ(
+                quantizer, dim, config["nlist"], config["pq_m"], 8, faiss_metric
+            )
+        elif qtype is None:
+            index = faiss.IndexIVFFlat(quantizer, dim, config["nlist"], faiss_metric)
+        else:
+            index = faiss.IndexIVFScalarQuantizer(
+                quantizer, dim, config["nlist"], qtype, faiss_metric
+            )
+
+    if not index.is_trained and len(embeddings):
+        # IVF centroids and int8 value ranges are learned from a sample
+        train = embeddings
+        if len(embeddings) > train_sample_size:
+            rng = np.random.default_rng(seed)
+            train = embeddings[
+                np.sort(rng.choice(len(embeddings), train_sample_size, replace=False))
+            ]
+        index.train(np.ascontiguousarray(train, dtype=np.float32))
+
+    # Add in slices so a memory-mapped matrix is never copied into RAM all at once
+    for start in range(0, len(embeddings), add_batch_size):
+        index.add(
+            np.ascontiguousarray(
+                embeddings[start : start + add_batch_size], dtype=np.float32
+            )
+        )
+    return index
+
+
+def set_search_params(index, nprobe=None, ef_search=None):
+    """Apply query-time accuracy/latency knobs to whichever index type this is."""
+    if nprobe is not None:
+        try:
+            faiss.extract_index_ivf(index).nprobe = nprobe
+        except RuntimeError:
+            pass  # Not an IVF index
+    if ef_search is not None and hasattr(index, "hnsw"):
+        index.hnsw.efSearch = ef_search
+    return index
+
+
+def evaluate_index(index, embeddings, queries, k=10, metric="l2"):
+    """Measure recall@k against exact search and mean query latency in ms."""
+    exact = flat_index(embeddings.shape[1], metric)
+    exact.add(np.ascontiguousarray(embeddings, dtype=np.float32))
+    _, truth = exact.search(queries, k)
+
+    start = time.perf_counter()
+    for query in queries:
+        index.search(query[None, :], k)
+    latency_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+    _, found = index.search(queries, k)
+    hits = sum(len(set(t) & set(f)) for t, f in zip(truth.tolist(), found.tolist()))
+    return {"recall": hits / truth.size, "latency_ms": latency_ms}
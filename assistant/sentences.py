@@ -0,0 +1,19 @@
+"""Sentence boundaries shared by knowledge base chunking and speech synthesis."""
+
+import re
+
+# End punctuation, any closing quotes or brackets, then whitespace; or line breaks
+SENTENCE_BOUNDARY_RE = re.compile(r"(?<=[.!?])[\"')\]]*\s+|\n+")
+
+
+def iter_sentences(text):
+    """Yield the non-empty sentences of ``text``, closing quotes included."""
+    start = 0
+    for match in SENTENCE_BOUNDARY_RE.finditer(text):
+        sentence = text[start : match.end()].strip()
+        if sentence:
+            yield sentence
+        start = match.end()
+    remainder = text[start:].strip()
+    if remainder:
+        yield remainder
@@ -0,0 +1,131 @@
+"""Bounded on-disk storage for generated audio.
+
+Files are spread over sharded subdirectories (``ab/speech_ab12....mp3``), so no
+single directory grows large. ``AudioStore.sweep`` deletes files not used for
+``ttl`` seconds, then the least recently used ones until the total size is back
+under ``max_bytes``; the API runs it from a background task. Reusing a file
+should ``touch`` it, since recency is tracked through modification times.
+"""
+
+import os
+import threading
+import time
+from pathlib import Path
+
+# A sweep that finds the store over quota deletes down to this fraction of it,
+# so the next few writes don't trigger another eviction straight away
+LOW_WATERMARK = 0.9
+# Temporary files from interrupted writes (".name.pid.tid") are removed after this
+STALE_TEMP_SECONDS = 3600
+
+
+class AudioStore:
+    def __init__(self, root, max_bytes=None, ttl=None, shard_chars=2):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.shard_chars = shard_chars
+        self._lock = threading.Lock()
+        self._stats = {
+            "files": 0,
+            "bytes": 0,
+            "evicted_files": 0,
+            "evicted_bytes": 0,
+            "last_sweep": None,
+            "sweep_seconds": None,
+        }
+
+    def path_for(self, key, suffix, prefix=""):
+        """Path of the file for content key ``key``, creating its shard directory."""
+        shard = self.root / key[: self.shard_chars]
+        shard.mkdir(exist_ok=True)
+        return shard / f"{prefix}{key}{suffix}"
+
+    def relative(self, path):
+        return Path(path).relative_to(self.root).as_posix()
+
+    @staticmethod
+    def touch(path):
+        # Marks a reused file as recently used; it may just have been evicted
+        try:
+            os.utime(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def _scan(self):
+        files = []
+        now = time.time()
+        for dirpath, _, names in os.walk(self.root):
+            for name in names:
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue  # Deleted by another worker's sweep
+                if name.startswith("."):
+                    if now - st.st_mtime > STALE_TEMP_SECONDS:
+                        self._remove(path)
+                    continue
+                files.append((st.st_mtime, st.st_size, path))
+        return files
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def sweep(self):
+        """Apply the TTL and quota; returns the updated ``stats()``."""
+        started = time.time()
+        files = self._scan()
+        evicted_files = evicted_bytes = 0
+
+        if self.ttl:
+            cutoff = started - self.ttl
+            kept = []
+            for mtime, size, path in files:
+                if mtime < cutoff:
+                    if self._remove(path):
+                        evicted_files += 1
+                        evicted_bytes += size
+                else:
+                    kept.append((mtime, size, path))
+            files = kept
+
+        total = sum(size for _, size, _ in files)
+        if self.max_bytes and total > self.max_bytes:
+            files.sort()  # Oldest first
+            target = self.max_bytes * LOW_WATERMARK
+            evicted = 0
+            for _, size, path in files:
+                if total <= target:
+                    break
+                evicted += 1
+                total -= size
+                if self._remove(path):
+                    evicted_files += 1
+                    evicted_bytes += size
+            files = files[evicted:]
+
+        with self._lock:
+            self._stats["files"] = len(files)
+            self._stats["bytes"] = total
+            self._stats["evicted_files"] += evicted_files
+            self._stats["evicted_bytes"] += evicted_bytes
+            self._stats["last_sweep"] = started
+            self._stats["sweep_seconds"] = time.time() - started
+        return self.stats()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "root": str(self.root),
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl,
+                **self._stats,
+            }
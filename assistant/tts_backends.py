@@ -0,0 +1,214 @@
+"""Speech synthesis backends used by ``OpenAITTS``.
+
+A backend only turns text into audio; caching, playback and sentence
+pipelining live in ``OpenAITTS``. Every backend returns 16-bit mono PCM at
+``PCM_SAMPLE_RATE`` from ``synthesize_pcm`` and encoded audio in one of its
+``formats`` from ``synthesize`` and ``stream``.
+
+- ``OpenAIBackend``: the OpenAI speech API (network, needs OPENAI_API_KEY).
+- ``PiperBackend``: Piper voices run offline on the CPU, in a pool of worker
+  processes that each keep the voice loaded.
+"""
+
+import multiprocessing
+import os
+import struct
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from sentences import iter_sentences
+
+try:
+    from piper import PiperVoice
+except ImportError:
+    PiperVoice = None
+
+# OpenAI's "pcm" format (24 kHz, 16-bit, mono); local voices are resampled to it.
+# main.OPENAI_TTS_PCM_SAMPLE_RATE is this same value.
+PCM_SAMPLE_RATE = 24000
+
+
+def wav_header(num_bytes=None, sample_rate=PCM_SAMPLE_RATE):
+    """RIFF header for 16-bit mono PCM; ``None`` marks a stream of unknown length."""
+    size = 0xFFFFFFFF - 36 if num_bytes is None else num_bytes
+    return (
+        b"RIFF"
+        + struct.pack("<I", size + 36)
+        + b"WAVEfmt "
+        + struct.pack("<IHHIIHH", 16, 1, 1, sample_rate, sample_rate * 2, 2, 16)
+        + b"data"
+        + struct.pack("<I", size)
+    )
+
+
+def patch_wav_sizes(path):
+    """Write the real RIFF and data sizes into a WAV file saved from a stream.
+
+    Streamed WAV headers carry placeholder sizes, since the length is not known
+    when they are sent; a file written from the stream is complete, so it gets
+    the actual ones.
+    """
+    with open(path, "r+b") as f:
+        total = f.seek(0, os.SEEK_END)
+        f.seek(0)
+        header = f.read(4096)
+        if total < 12 or header[:4] != b"RIFF" or header[8:12] != b"WAVE":
+            return
+        f.seek(4)
+        f.write(struct.pack("<I", total - 8))
+        pos = 12
+        while pos + 8 <= len(header):
+            chunk_id = header[pos : pos + 4]
+            (size,) = struct.unpack("<I", header[pos + 4 : pos + 8])
+            if chunk_id == b"data":
+                f.seek(pos + 4)
+                f.write(struct.pack("<I", total - pos - 8))
+                return
+            pos += 8 + size + (size & 1)
+
+
+class OpenAIBackend:
+    formats = ("mp3", "opus", "aac", "flac", "wav", "pcm")
+
+    def __init__(self, client, model, voice, max_parallel=4):
+        self.client = client
+        self.model = model
+        self.voice = voice
+        self.max_parallel = max_parallel
+
+    def warmup(self):
+        pass
+
+    def synthesize(self, text, response_format):
+        response = self.client.audio.speech.create(
+            model=self.model,
+            voice=self.voice,
+            input=text,
+            response_format=response_format,
+        )
+        return response.content
+
+    def synthesize_pcm(self, text):
+        return self.synthesize(text, "pcm")
+
+    def synthesize_many(self, texts):
+        # Requests are network-bound, so threads are enough to overlap them
+        with ThreadPoolExecutor(max_workers=self.max_parallel) as pool:
+            return list(pool.map(self.synthesize_pcm, texts))
+
+    def stream(self, text, response_format, chunk_size):
+        with self.client.audio.speech.with_streaming_response.create(
+            model=self.model,
+            voice=self.voice,
+            input=text,
+            response_format=response_format,
+        ) as response:
+            yield from response.iter_bytes(chunk_size)
+
+    def close(self):
+        pass
+
+
+# Set in each PiperBackend worker process by _load_voice
+_worker_voice = None
+
+
+def _load_voice(model_path):
+    global _worker_voice
+    _worker_voice = PiperVoice.load(model_path)
+
+
+def _synthesize_worker(text):
+    if hasattr(_worker_voice, "synthesize_stream_raw"):  # piper-tts < 1.3
+        audio = np.frombuffer(
+            b"".join(_worker_voice.synthesize_stream_raw(text)), dtype=np.int16
+        )
+        audio = audio.astype(np.float32) / 32768.0
+    else:
+        chunks = [chunk.audio_float_array for chunk in _worker_voice.synthesize(text)]
+        audio = np.concatenate(chunks) if chunks else np.zeros(0, dtype=np.float32)
+    sample_rate = _worker_voice.config.sample_rate
+    if sample_rate != PCM_SAMPLE_RATE and len(audio):
+        # Linear interpolation onto the shared output rate
+        num_out = int(len(audio) * PCM_SAMPLE_RATE / sample_rate)
+        positions = np.arange(num_out) * (sample_rate / PCM_SAMPLE_RATE)
+        audio = np.interp(positions, np.arange(len(audio)), audio)
+    return (np.clip(audio, -1.0, 1.0) * 32767).astype("<i2").tobytes()
+
+
+def _warmup_worker(_):
+    _synthesize_worker("Ready.")
+    return os.getpid()
+
+
+class PiperBackend:
+    """Offline synthesis with a Piper voice (``.onnx`` plus its ``.onnx.json``).
+
+    Each worker process loads the voice once. Workers are spawned rather than
+    forked, so the pool is safe to start from a process with running threads;
+    it is created on first use in each process (after gunicorn forks its
+    workers), and ``warmup`` starts every worker ahead of the first request.
+    """
+
+    formats = ("wav", "pcm")
+
+    def __init__(self, model_path, workers=2):
+        if PiperVoice is None:
+            raise ImportError("piper-tts is not installed (pip install piper-tts)")
+        self.model_path = str(model_path)
+        if not Path(self.model_path).exists():
+            raise FileNotFoundError(f"Piper voice not found: {self.model_path}")
+        self.workers = workers
+        self._pool = None
+        self._pid = None
+
+    def _executor(self):
+        if self._pool is None or self._pid != os.getpid():
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_load_voice,
+                initargs=(self.model_path,),
+            )
+            self._pid = os.getpid()
+        return self._pool
+
+    def warmup(self):
+        # One job per worker makes the pool start all of them now
+        pool = self._executor()
+        list(pool.map(_warmup_worker, range(self.workers)))
+
+    def synthesize_pcm(self, text):
+        return self._executor().submit(_synthesize_worker, text).result()
+
+    def synthesize_many(self, texts):
+        """Synthesize several texts in parallel across the workers, in order."""
+        return list(self._executor().map(_synthesize_worker, texts))
+
+    def synthesize(self, text, response_format):
+        # Sentences are separate jobs, so the workers share one text between them
+        pcm = b"".join(self.synthesize_many(list(iter_sentences(text))))
+        return wav_header(len(pcm)) + pcm if response_format == "wav" else pcm
+
+    def stream(self, text, response_format, chunk_size):
+        # Sentences are synthesized in parallel and sent as each one, in order, is done
+        pool = self._executor()
+        futures = [
+            pool.submit(_synthesize_worker, sentence)
+            for sentence in iter_sentences(text)
+        ]
+        try:
+            if response_format == "wav":
+                yield wav_header()
+            for future in futures:
+                yield future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def close(self):
+        if self._pool is not None and self._pid == os.getpid():
+            self._pool.shutdown(wait=False, cancel_futures=True)
+        self._pool = None